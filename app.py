@@ -1360,12 +1360,16 @@ def api_sync_status():
         sync_status = client.get_sync_status()
         collection_stats = client.get_collection_stats()
         
-        return jsonify({
+        response = jsonify({
             'sync_status': sync_status,
             'collection_stats': collection_stats,
             'client_online': client.is_online()
         })
         
+        # Status is polled while a sync runs; unchanged polls get a bodiless 304
+        response.add_etag()
+        return response.make_conditional(request)
+        
     except Exception as e:
         logger.error(f"API sync status error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
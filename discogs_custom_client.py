@@ -18,6 +18,7 @@ import logging
 import sqlite3
 import requests
 import threading
+from collections import deque
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, Dict, List, Any, Tuple, Iterator
@@ -61,8 +62,13 @@ class DiscogsRateLimiter:
         """Initialize rate limiter with conservative defaults."""
         self.max_requests = max_requests  # Conservative limit (Discogs allows 60)
         self.window = window
-        self.requests = []
+        self.requests = deque()  # Request timestamps, oldest first
         self.lock = threading.Lock()
+    
+    def _prune(self, now: float):
+        """Drop request timestamps that have left the window."""
+        while self.requests and now - self.requests[0] >= self.window:
+            self.requests.popleft()
         
     def wait_if_needed(self):
         """Wait if rate limit would be exceeded."""
@@ -70,21 +76,22 @@ class DiscogsRateLimiter:
             now = time.time()
             
             # Remove old requests outside the window
-            self.requests = [req_time for req_time in self.requests if now - req_time < self.window]
+            self._prune(now)
             
             # Check if we need to wait
             if len(self.requests) >= self.max_requests:
-                oldest_request = min(self.requests)
+                oldest_request = self.requests[0]
                 wait_time = self.window - (now - oldest_request) + 0.1  # Small buffer
                 if wait_time > 0:
                     logger.info(f"Rate limit approaching, waiting {wait_time:.1f} seconds")
                     time.sleep(wait_time)
                     # Clean up again after waiting
                     now = time.time()
-                    self.requests = [req_time for req_time in self.requests if now - req_time < self.window]
+                    self._prune(now)
             
             # Record this request
             self.requests.append(now)
+    
 
 class DiscogsSession:
     """
@@ -26,11 +26,13 @@ from typing import Optional, Dict, List, Tuple, Any, Union
 from dataclasses import dataclass, asdict
 from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from functools import wraps
+from functools import wraps, lru_cache
+from urllib.parse import urldefrag, urlsplit
 import gc
 
 import requests
-from PIL import Image, ImageOps
+from urllib3.util.retry import Retry
+from PIL import Image
 from PIL import ExifTags
 import io
 
@@ -39,6 +41,24 @@ from config import Config
 # Configure module-specific logging
 logger = logging.getLogger(__name__)
 
+# EXIF Orientation value -> transpose that restores upright display
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+SWAPS_AXES = frozenset({
+    Image.Transpose.TRANSPOSE, Image.Transpose.ROTATE_270,
+    Image.Transpose.TRANSVERSE, Image.Transpose.ROTATE_90,
+})
+
+# File extensions accepted for cover image URLs
+VALID_IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.webp', '.gif'})
+
 @dataclass
 class CacheEntry:
     """Represents a cached image entry with metadata."""
@@ -96,6 +116,24 @@ class MemoryOptimizedProcessor:
         Returns:
             Processed WebP image bytes
         """
+        return MemoryOptimizedProcessor.process_image_with_size(
+            image_data, target_size, optimize_memory
+        )[0]
+    
+    @staticmethod
+    def process_image_with_size(image_data: bytes, target_size: Tuple[int, int],
+                                optimize_memory: bool = True) -> Tuple[bytes, Tuple[int, int]]:
+        """
+        Process image data to WebP format and report the resulting dimensions.
+        
+        Args:
+            image_data: Raw image bytes
+            target_size: Target dimensions (width, height)
+            optimize_memory: Enable memory optimizations for Pi
+            
+        Returns:
+            Tuple of processed WebP image bytes and (width, height)
+        """
         try:
             # Force garbage collection before processing
             if optimize_memory:
@@ -103,8 +141,19 @@ class MemoryOptimizedProcessor:
             
             # Open image with memory-efficient loading
             with Image.open(io.BytesIO(image_data)) as img:
-                # Handle EXIF orientation
-                img = ImageOps.exif_transpose(img)
+                # Let the JPEG decoder downscale by a power of two while
+                # decoding; keep 2x the target so LANCZOS still has detail.
+                # Square box so a 90-degree EXIF rotation can't undershoot.
+                # No-op for other formats.
+                draft_edge = max(target_size) * 2
+                img.draft('RGB', (draft_edge, draft_edge))
+                
+                # Read EXIF orientation now; it is applied after resizing so
+                # the rotation works on the small image, and conversion
+                # below drops the EXIF block
+                transpose = EXIF_TRANSPOSE.get(img.getexif().get(ExifTags.Base.Orientation))
+                if transpose in SWAPS_AXES:
+                    target_size = (target_size[1], target_size[0])
                 
                 # Convert to RGB if necessary (WebP doesn't support transparency well)
                 if img.mode in ('RGBA', 'LA', 'P'):
@@ -123,6 +172,10 @@ class MemoryOptimizedProcessor:
                 # Calculate resize dimensions maintaining aspect ratio
                 img.thumbnail(target_size, Image.Resampling.LANCZOS)
                 
+                # Handle EXIF orientation
+                if transpose is not None:
+                    img = img.transpose(transpose)
+                
                 # Save to WebP format
                 output = io.BytesIO()
                 img.save(output, 
@@ -132,13 +185,14 @@ class MemoryOptimizedProcessor:
                         method=6)  # Best compression
                 
                 processed_data = output.getvalue()
+                processed_size = img.size
                 
                 # Force cleanup
                 if optimize_memory:
                     del img, output
                     gc.collect()
                 
-                return processed_data
+                return processed_data, processed_size
                 
         except Exception as e:
             logger.error(f"Image processing failed: {str(e)}")
@@ -180,6 +234,11 @@ class LRUCache:
                 self.stats['misses'] += 1
                 return None
     
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """Get cache entry without updating access time or hit statistics."""
+        with self.lock:
+            return self.cache_data.get(key)
+    
     def put(self, key: str, entry: CacheEntry) -> bool:
         """Add entry to cache, evicting if necessary."""
         with self.lock:
@@ -249,6 +308,18 @@ class LRUCache:
                 return True
             return False
     
+    def keys_accessed_before(self, cutoff: datetime) -> List[str]:
+        """Get keys not accessed since cutoff, oldest first."""
+        with self.lock:
+            stale_keys = []
+            # cache_order runs from least to most recently used, so stop at
+            # the first entry that is still fresh
+            for key in self.cache_order:
+                if self.cache_data[key].last_accessed >= cutoff:
+                    break
+                stale_keys.append(key)
+            return stale_keys
+    
     def clear(self):
         """Clear all cache entries."""
         with self.lock:
@@ -280,6 +351,13 @@ class LRUCache:
                 'total_requests': self.stats['total_requests']
             }
 
+@lru_cache(maxsize=4096)
+def _cache_key_for(url: str, size_type: str) -> str:
+    """Hash a URL and size type into a cache key, memoized per pair."""
+    # Fragments never reach the server, so they must not split the cache
+    content = f"{urldefrag(url).url}:{size_type}"
+    return hashlib.sha256(content.encode()).hexdigest()
+
 class ImageCache:
     """
     Main image caching system with comprehensive features.
@@ -296,6 +374,7 @@ class ImageCache:
             max_cache_size: Maximum cache size in bytes (default 2GB)
         """
         self.cache_dir = Path(cache_dir)
+        self._cache_dir_prefix = str(self.cache_dir) + os.sep
         self.database_path = Path(database_path)
         self.max_cache_size = max_cache_size
         
@@ -312,12 +391,20 @@ class ImageCache:
         # Thread pool for background processing
         self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ImageCache")
         
+        # Striped locks so only requests for the same key wait on a download
+        self._key_locks = [threading.Lock() for _ in range(32)]
+        
         # Initialize cache database
         self._init_cache_database()
         
         # Load existing cache entries
         self._load_cache_from_database()
         
+        # Generate placeholders up front; size_type -> path
+        self._placeholder_paths: Dict[str, str] = {}
+        for size_type in ('thumbnails', 'detail'):
+            self.get_placeholder_path(size_type)
+        
         logger.info(f"Image cache initialized: {cache_dir}, max size: {max_cache_size / (1024*1024):.1f}MB")
     
     def _create_session(self) -> requests.Session:
@@ -333,7 +420,7 @@ class ImageCache:
         adapter = requests.adapters.HTTPAdapter(
             pool_connections=2,
             pool_maxsize=4,
-            max_retries=3
+            max_retries=Retry(total=3, backoff_factor=0.3)
         )
         session.mount('http://', adapter)
         session.mount('https://', adapter)
@@ -387,8 +474,9 @@ class ImageCache:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
+            # Oldest first, so the LRU order matches access history
             cursor.execute("""
-                SELECT * FROM image_cache ORDER BY last_accessed DESC
+                SELECT * FROM image_cache ORDER BY last_accessed ASC
             """)
             
             loaded_count = 0
@@ -427,13 +515,30 @@ class ImageCache:
     
     def _generate_cache_key(self, url: str, size_type: str) -> str:
         """Generate unique cache key for URL and size type."""
-        content = f"{url}:{size_type}"
-        return hashlib.sha256(content.encode()).hexdigest()
+        return _cache_key_for(url, size_type)
+    
+    def _lock_for(self, cache_key: str) -> threading.Lock:
+        """Get the lock stripe guarding downloads for a cache key."""
+        return self._key_locks[hash(cache_key) & 31]
     
     def _get_cache_file_path(self, cache_key: str, size_type: str) -> Path:
         """Get file path for cached image."""
         return self.cache_dir / size_type / f"{cache_key}.webp"
     
+    def _is_valid_image_url(self, url: str) -> bool:
+        """Check that a URL points at a supported image type by its extension."""
+        return os.path.splitext(urlsplit(url).path)[1].lower() in VALID_IMAGE_EXTENSIONS
+    
+    def _cache_relative_url(self, file_path: str) -> str:
+        """Convert a path under the cache directory to its /cache/ URL."""
+        # Cached paths are built from cache_dir, so a string prefix check
+        # avoids constructing Path objects on every template lookup
+        if file_path.startswith(self._cache_dir_prefix):
+            rel_path = file_path[len(self._cache_dir_prefix):]
+        else:
+            rel_path = str(Path(file_path).relative_to(self.cache_dir))
+        return f"/cache/{rel_path.replace(os.sep, '/')}"
+    
     def _download_image(self, url: str, timeout: int = 30) -> bytes:
         """Download image from URL with error handling."""
         try:
@@ -447,14 +552,22 @@ class ImageCache:
             
             # Download with size limit (10MB max)
             max_size = 10 * 1024 * 1024
-            content = b''
             
-            for chunk in response.iter_content(chunk_size=8192):
+            # Refuse oversized images before reading the body
+            content_length = response.headers.get('content-length')
+            if content_length and content_length.isdigit() and int(content_length) > max_size:
+                response.close()
+                raise ImageProcessingError("Image too large")
+            
+            # Grow one buffer in place rather than copying on every chunk
+            content = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
                 content += chunk
                 if len(content) > max_size:
+                    response.close()
                     raise ImageProcessingError("Image too large")
             
-            return content
+            return bytes(content)
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to download image from {url}: {e}")
@@ -488,6 +601,7 @@ class ImageCache:
         """Download, process, and cache an image."""
         cache_key = self._generate_cache_key(url, size_type)
         file_path = self._get_cache_file_path(cache_key, size_type)
+        tmp_path = file_path.with_suffix('.tmp')
         
         try:
             # Download image
@@ -502,16 +616,16 @@ class ImageCache:
             
             # Process image
             logger.debug(f"Processing image for {size_type}")
-            processed_data = self.processor.process_image(image_data, target_size)
-            
-            # Get image dimensions
-            with Image.open(io.BytesIO(processed_data)) as img:
-                width, height = img.size
+            processed_data, (width, height) = self.processor.process_image_with_size(
+                image_data, target_size
+            )
             
-            # Save to disk
+            # Save to disk; write aside and rename so a crash never
+            # leaves a truncated file under the cache key
             file_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(file_path, 'wb') as f:
+            with open(tmp_path, 'wb') as f:
                 f.write(processed_data)
+            os.replace(tmp_path, file_path)
             
             # Create cache entry
             now = datetime.now()
@@ -543,11 +657,12 @@ class ImageCache:
         except Exception as e:
             logger.error(f"Failed to process and cache image {url}: {e}")
             # Clean up partial file
-            if file_path.exists():
-                try:
-                    file_path.unlink()
-                except Exception:
-                    pass
+            for path in (tmp_path, file_path):
+                if path.exists():
+                    try:
+                        path.unlink()
+                    except Exception:
+                        pass
             return None
     
     def get_image(self, url: str, size_type: str = 'detail') -> Optional[str]:
@@ -573,9 +688,21 @@ class ImageCache:
             self._save_cache_entry(cache_key, entry)
             return entry.file_path
         
+        # Don't spend a download on URLs whose extension rules out an image;
+        # extensionless URLs are left to the content-type check
+        if os.path.splitext(urlsplit(url).path)[1] and not self._is_valid_image_url(url):
+            logger.warning(f"Skipping non-image URL: {url}")
+            return None
+        
         # Image not in cache or file missing, process it
-        entry = self._process_and_cache_image(url, size_type)
-        return entry.file_path if entry else None
+        with self._lock_for(cache_key):
+            # Another thread may have cached it while we waited
+            entry = self.lru_cache.peek(cache_key)
+            if entry and os.path.exists(entry.file_path):
+                return entry.file_path
+            
+            entry = self._process_and_cache_image(url, size_type)
+            return entry.file_path if entry else None
     
     def get_image_async(self, url: str, size_type: str = 'detail') -> 'Future':
         """
@@ -603,19 +730,39 @@ class ImageCache:
         """
         results = {}
         total_urls = len(urls)
+        completed = 0
         
-        # Submit all tasks
+        # Phase 1: settle sizes that are already on disk without a worker
         future_to_url = {}
         for url in urls:
-            if url:  # Skip empty URLs
-                # Preload both sizes
-                future_thumb = self.executor.submit(self.get_image, url, 'thumbnails')
-                future_detail = self.executor.submit(self.get_image, url, 'detail')
-                future_to_url[future_thumb] = (url, 'thumbnails')
-                future_to_url[future_detail] = (url, 'detail')
+            if not url:  # Skip empty URLs
+                continue
+            
+            pending = []
+            for size_type in ('thumbnails', 'detail'):
+                entry = self.lru_cache.peek(self._generate_cache_key(url, size_type))
+                if not (entry and os.path.exists(entry.file_path)):
+                    pending.append(size_type)
+            
+            if not pending:
+                results[url] = True
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed, total_urls, url)
+                continue
+            
+            # Phase 2: download only the missing sizes
+            for size_type in pending:
+                future = self.executor.submit(self.get_image, url, size_type)
+                future_to_url[future] = (url, size_type)
+            
+            if 'detail' not in pending:
+                # Completion is counted on the detail image, which is cached
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed, total_urls, url)
         
         # Process completed tasks
-        completed = 0
         for future in as_completed(future_to_url):
             url, size_type = future_to_url[future]
             try:
@@ -650,6 +797,10 @@ class ImageCache:
         Returns:
             Path to placeholder image
         """
+        placeholder = self._placeholder_paths.get(size_type)
+        if placeholder:
+            return placeholder
+        
         # Create a simple colored placeholder if it doesn't exist
         placeholder_dir = self.cache_dir / 'placeholders'
         placeholder_dir.mkdir(exist_ok=True)
@@ -688,7 +839,9 @@ class ImageCache:
                 
             except Exception as e:
                 logger.error(f"Failed to create placeholder: {e}")
+                return str(placeholder_path)
         
+        self._placeholder_paths[size_type] = str(placeholder_path)
         return str(placeholder_path)
     
     def cleanup_cache(self, max_age_days: int = 30) -> int:
@@ -705,31 +858,23 @@ class ImageCache:
         cleaned_count = 0
         
         try:
-            conn = sqlite3.connect(str(self.database_path))
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Get old entries
-            cursor.execute("""
-                SELECT cache_key, file_path FROM image_cache 
-                WHERE last_accessed < ?
-            """, (cutoff_date.isoformat(),))
-            
-            old_entries = cursor.fetchall()
+            # Walk the LRU order from the oldest end; only stale entries are visited
+            stale_keys = self.lru_cache.keys_accessed_before(cutoff_date)
             
-            for row in old_entries:
-                cache_key = row['cache_key']
-                file_path = row['file_path']
-                
-                # Remove from LRU cache
+            for cache_key in stale_keys:
+                # Remove from LRU cache (also removes the file)
                 if self.lru_cache.remove(cache_key):
                     cleaned_count += 1
-                
-                # Remove from database
-                cursor.execute("DELETE FROM image_cache WHERE cache_key = ?", (cache_key,))
             
-            conn.commit()
-            conn.close()
+            # Remove from database in one batch
+            if stale_keys:
+                conn = sqlite3.connect(str(self.database_path))
+                conn.executemany(
+                    "DELETE FROM image_cache WHERE cache_key = ?",
+                    [(cache_key,) for cache_key in stale_keys]
+                )
+                conn.commit()
+                conn.close()
             
             logger.info(f"Cleaned up {cleaned_count} old cache entries")
             return cleaned_count
@@ -744,24 +889,20 @@ class ImageCache:
             conn = sqlite3.connect(str(self.database_path))
             cursor = conn.cursor()
             
-            # Get counts by type
+            # Get counts and sizes by type in a single pass
             cursor.execute("""
-                SELECT size_type, COUNT(*) as count 
+                SELECT size_type, COUNT(*) as count, SUM(file_size) as total_size
                 FROM image_cache 
                 GROUP BY size_type
             """)
-            type_counts = dict(cursor.fetchall())
-            
-            # Get total size
-            cursor.execute("SELECT SUM(file_size) as total_size FROM image_cache")
-            total_size = cursor.fetchone()[0] or 0
-            
-            # Get total entries
-            cursor.execute("SELECT COUNT(*) as total FROM image_cache")
-            total_entries = cursor.fetchone()[0]
+            rows = cursor.fetchall()
             
             conn.close()
             
+            type_counts = {size_type: count for size_type, count, _ in rows}
+            total_entries = sum(count for _, count, _ in rows)
+            total_size = sum(size or 0 for _, _, size in rows)
+            
             # Get LRU cache stats
             lru_stats = self.lru_cache.get_stats()
             
@@ -780,6 +921,19 @@ class ImageCache:
             logger.error(f"Failed to get cache stats: {e}")
             return CacheStats(0, 0, 0, 0, 0.0, self.max_cache_size, self.max_cache_size, None)
     
+    def get_cache_size_mb(self) -> float:
+        """
+        Get the current size of cached images in megabytes.
+        
+        Uses the running byte count kept by the LRU cache, so no directory
+        walk or database query is needed.
+        
+        Returns:
+            Cache size in MB
+        """
+        with self.lru_cache.lock:
+            return self.lru_cache.current_size_bytes / (1024 * 1024)
+    
     def clear_cache(self) -> bool:
         """Clear all cached images."""
         try:
@@ -878,8 +1032,7 @@ def get_cached_image_url(discogs_url: str, size_type: str = 'detail') -> Optiona
     cached_path = cache.get_image(discogs_url, size_type)
     if cached_path:
         # Convert absolute path to relative URL
-        cache_rel_path = Path(cached_path).relative_to(cache.cache_dir)
-        return f"/cache/{cache_rel_path}"
+        return cache._cache_relative_url(cached_path)
     
     return None
 
@@ -887,9 +1040,7 @@ def get_placeholder_url(size_type: str = 'detail') -> str:
     """Get placeholder image URL."""
     cache = get_image_cache()
     if cache:
-        placeholder_path = cache.get_placeholder_path(size_type)
-        cache_rel_path = Path(placeholder_path).relative_to(cache.cache_dir)
-        return f"/cache/{cache_rel_path}"
+        return cache._cache_relative_url(cache.get_placeholder_path(size_type))
     
     # Fallback to static placeholder
     return "/static/vinyl-icon.svg"
@@ -16,10 +16,13 @@ import logging
 import random
 import time
 import threading
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, asdict
-from collections import defaultdict, deque
+from typing import Dict, List, Optional, Sequence, Tuple, Any, Union
+from dataclasses import dataclass, asdict, replace
+from collections import Counter, defaultdict, deque
 from pathlib import Path
 import math
 
@@ -37,9 +40,15 @@ class SelectionMetrics:
     last_updated: datetime = None
 
 
-@dataclass
+@dataclass(frozen=True)
 class AlgorithmConfig:
-    """Configuration parameters for the random selection algorithm."""
+    """
+    Configuration parameters for the random selection algorithm.
+    
+    Immutable, so instances are hashable and can be shared between the
+    algorithm, its weight calculator and A/B tests; derive variants with
+    dataclasses.replace().
+    """
     # Weighting factors
     rating_weight: float = 2.0
     play_count_weight: float = 1.5
@@ -141,11 +150,12 @@ class WeightCalculator:
         normalized = play_count / avg_play_count
         return (math.log(normalized + 1) * self.config.play_count_weight) + 0.1
     
-    def calculate_recency_weight(self, date_added: str, last_played: str = None) -> float:
+    def calculate_recency_weight(self, date_added: str, last_played: str = None,
+                                 now: datetime = None) -> float:
         """Calculate weight based on how recently album was added/played."""
         try:
             added_date = datetime.fromisoformat(date_added.replace('Z', '+00:00'))
-            now = datetime.now()
+            now = now or datetime.now()
             
             # Newer additions get slightly higher weight
             days_since_added = (now - added_date).days
@@ -164,7 +174,8 @@ class WeightCalculator:
         except (ValueError, TypeError):
             return 1.0
     
-    def calculate_genre_diversity_weight(self, genres: List[str], recent_genres: List[str]) -> float:
+    def calculate_genre_diversity_weight(self, genres: List[str],
+                                         recent_genres: Union[List[str], Counter]) -> float:
         """Calculate weight to promote genre diversity."""
         if not genres:
             return 1.0
@@ -174,31 +185,37 @@ class WeightCalculator:
             return 1.0
             
         # Reduce weight if genre was recently selected
-        recent_count = recent_genres.count(primary_genre)
+        if not isinstance(recent_genres, Counter):
+            recent_genres = Counter(recent_genres)
+        recent_count = recent_genres[primary_genre]
         if recent_count == 0:
             return 1.0 + self.config.genre_diversity_weight
         else:
             # Exponential penalty for repeated genres
             return max(0.1, 1.0 / (recent_count ** 2))
     
-    def calculate_artist_diversity_weight(self, artist: str, recent_artists: List[str]) -> float:
+    def calculate_artist_diversity_weight(self, artist: str,
+                                          recent_artists: Union[List[str], Counter]) -> float:
         """Calculate weight to prevent same artist streaks."""
         if not artist:
             return 1.0
             
-        recent_count = recent_artists.count(artist)
+        if not isinstance(recent_artists, Counter):
+            recent_artists = Counter(recent_artists)
+        recent_count = recent_artists[artist]
         if recent_count == 0:
             return 1.0
         else:
             # Strong penalty for artist repetition
             return max(0.05, 1.0 / (recent_count ** 3))
     
-    def apply_seasonal_adjustment(self, genres: List[str], weight: float) -> float:
+    def apply_seasonal_adjustment(self, genres: List[str], weight: float,
+                                  now: datetime = None) -> float:
         """Apply seasonal adjustments to weights."""
         if not self.config.seasonal_adjustment or not genres:
             return weight
             
-        current_month = datetime.now().month
+        current_month = (now or datetime.now()).month
         primary_genre = genres[0].lower() if genres else ""
         
         # Simple seasonal preferences
@@ -219,12 +236,13 @@ class WeightCalculator:
                 
         return weight
     
-    def apply_time_based_adjustment(self, genres: List[str], weight: float) -> float:
+    def apply_time_based_adjustment(self, genres: List[str], weight: float,
+                                    now: datetime = None) -> float:
         """Apply time-of-day based adjustments."""
         if not self.config.time_based_preferences or not genres:
             return weight
             
-        current_hour = datetime.now().hour
+        current_hour = (now or datetime.now()).hour
         primary_genre = genres[0].lower() if genres else ""
         
         # Time-based preferences
@@ -240,6 +258,100 @@ class WeightCalculator:
                 
         return weight
 
+    
+    def calculate_album_weights(self, albums: List[Any], recent_genres: List[str],
+                                recent_artists: List[str], recent_albums: List[int],
+                                now: datetime = None) -> List[Tuple]:
+        """
+        Score a whole collection in one pass.
+        
+        Values shared by every album (the clock, average play count) are
+        computed once instead of per album.
+        
+        Args:
+            albums: Album rows with id, artist, genres, rating, play_count,
+                date_added and last_played
+            recent_genres: Recently selected primary genres
+            recent_artists: Recently selected artists
+            recent_albums: Album IDs to skip as recently selected
+            now: Reference time for recency, season and time of day
+            
+        Returns:
+            intelligent_cache rows: (album_id, base_weight, rating_weight,
+            play_count_weight, recency_weight, diversity_weight,
+            final_weight, last_computed)
+        """
+        now = now or datetime.now()
+        computed_at = now.isoformat()
+        
+        # Tally recent history once so per-album lookups are O(1)
+        genre_counts = Counter(recent_genres)
+        artist_counts = Counter(recent_artists)
+        skipped_albums = set(recent_albums)
+        
+        # Average play count for normalization
+        play_counts = [a['play_count'] or 0 for a in albums]
+        avg_play_count = sum(play_counts) / len(play_counts) if play_counts else 1.0
+        
+        cache_entries = []
+        for album in albums:
+            try:
+                # Skip recently selected albums
+                if album['id'] in skipped_albums:
+                    continue
+                
+                genres = json.loads(album['genres'] or '[]')
+                
+                # Calculate individual weight components
+                rating_weight = self.calculate_rating_weight(album['rating'])
+                play_count_weight = self.calculate_play_count_weight(
+                    album['play_count'], avg_play_count
+                )
+                recency_weight = self.calculate_recency_weight(
+                    album['date_added'], album['last_played'], now
+                )
+                diversity_weight = self.calculate_genre_diversity_weight(genres, genre_counts)
+                artist_weight = self.calculate_artist_diversity_weight(
+                    album['artist'], artist_counts
+                )
+                
+                # Combine weights
+                base_weight = rating_weight * play_count_weight * recency_weight
+                final_weight = base_weight * diversity_weight * artist_weight
+                
+                # Apply seasonal and time-based adjustments
+                final_weight = self.apply_seasonal_adjustment(genres, final_weight, now)
+                final_weight = self.apply_time_based_adjustment(genres, final_weight, now)
+                
+                # Ensure minimum weight
+                final_weight = max(0.01, final_weight)
+                
+                cache_entries.append((
+                    album['id'], 1.0, rating_weight, play_count_weight,
+                    recency_weight, diversity_weight, final_weight, computed_at
+                ))
+                
+            except Exception as e:
+                logger.error(f"Error calculating weights for album {album['id']}: {e}")
+                continue
+        
+        return cache_entries
+
+def weighted_choice(items: Sequence[Any], cum_weights: Sequence[float]) -> Any:
+    """
+    Pick one item with probability proportional to its weight.
+    
+    Args:
+        items: Candidates to choose from
+        cum_weights: Running totals of the item weights, as produced by
+            itertools.accumulate; must be the same length as items
+    
+    Returns:
+        The chosen item, in O(log N) via binary search over the totals
+    """
+    r = random.random() * cum_weights[-1]
+    return items[min(bisect_right(cum_weights, r), len(items) - 1)]
+
 
 class RandomAlgorithm:
     """Intelligent random record selection algorithm."""
@@ -253,6 +365,12 @@ class RandomAlgorithm:
         self.cache_lock = threading.Lock()
         self.last_cache_refresh = datetime.now()
         
+        # Album IDs and running weight totals of the intelligent cache,
+        # rebuilt on every refresh so each pick is a binary search. Packed
+        # arrays keep 8 bytes per album instead of a boxed object each.
+        self._cache_album_ids = array('q')
+        self._cum_weights = array('d')
+        
         # Initialize algorithm state
         self._initialize_database_extensions()
         self._load_selection_history()
@@ -367,60 +485,15 @@ class RandomAlgorithm:
                     logger.warning("No albums found for cache refresh")
                     return
                 
-                # Calculate average play count for normalization
-                play_counts = [a['play_count'] or 0 for a in albums]
-                avg_play_count = sum(play_counts) / len(play_counts) if play_counts else 1.0
-                
                 # Get recent selections for diversity calculation
                 recent_genres = self.history.get_recent_genres(self.config.genre_cooldown_selections)
                 recent_artists = self.history.get_recent_artists(self.config.max_same_artist_streak)
                 recent_albums = self.history.get_recent_albums(self.config.min_time_between_repeats_hours)
                 
-                # Calculate weights for each album
-                cache_entries = []
-                for album in albums:
-                    try:
-                        genres = json.loads(album['genres'] or '[]')
-                        
-                        # Skip recently selected albums
-                        if album['id'] in recent_albums:
-                            continue
-                        
-                        # Calculate individual weight components
-                        rating_weight = self.weight_calculator.calculate_rating_weight(album['rating'])
-                        play_count_weight = self.weight_calculator.calculate_play_count_weight(
-                            album['play_count'], avg_play_count
-                        )
-                        recency_weight = self.weight_calculator.calculate_recency_weight(
-                            album['date_added'], album['last_played']
-                        )
-                        diversity_weight = self.weight_calculator.calculate_genre_diversity_weight(
-                            genres, recent_genres
-                        )
-                        artist_weight = self.weight_calculator.calculate_artist_diversity_weight(
-                            album['artist'], recent_artists
-                        )
-                        
-                        # Combine weights
-                        base_weight = rating_weight * play_count_weight * recency_weight
-                        final_weight = base_weight * diversity_weight * artist_weight
-                        
-                        # Apply seasonal and time-based adjustments
-                        final_weight = self.weight_calculator.apply_seasonal_adjustment(genres, final_weight)
-                        final_weight = self.weight_calculator.apply_time_based_adjustment(genres, final_weight)
-                        
-                        # Ensure minimum weight
-                        final_weight = max(0.01, final_weight)
-                        
-                        cache_entries.append((
-                            album['id'], 1.0, rating_weight, play_count_weight,
-                            recency_weight, diversity_weight, final_weight,
-                            datetime.now().isoformat()
-                        ))
-                        
-                    except Exception as e:
-                        logger.error(f"Error calculating weights for album {album['id']}: {e}")
-                        continue
+                # Calculate weights for the whole collection
+                cache_entries = self.weight_calculator.calculate_album_weights(
+                    albums, recent_genres, recent_artists, recent_albums
+                )
                 
                 # Clear old cache and insert new entries
                 conn.execute("DELETE FROM intelligent_cache")
@@ -435,6 +508,9 @@ class RandomAlgorithm:
                 
                 conn.commit()
                 
+                self._cache_album_ids = array('q', (entry[0] for entry in cache_entries))
+                self._cum_weights = array('d', accumulate(entry[6] for entry in cache_entries))
+                
                 elapsed_ms = (time.time() - start_time) * 1000
                 logger.info(f"Cache refreshed with {len(cache_entries)} entries in {elapsed_ms:.1f}ms")
                 
@@ -457,17 +533,38 @@ class RandomAlgorithm:
                 with sqlite3.connect(self.db_path) as conn:
                     conn.row_factory = sqlite3.Row
                     
+                    result = None
+                    
                     # Get weighted selection from cache
-                    cursor = conn.execute("""
-                        SELECT ic.*, a.title, a.artist, a.year, a.cover_url, a.genres, a.styles
-                        FROM intelligent_cache ic
-                        JOIN albums a ON ic.album_id = a.id
-                        WHERE ic.final_weight > 0
-                        ORDER BY RANDOM() * ic.final_weight DESC
-                        LIMIT 1
-                    """)
+                    if self._cum_weights:
+                        album_id = weighted_choice(self._cache_album_ids, self._cum_weights)
+                        cursor = conn.execute("""
+                            SELECT ic.*, a.title, a.artist, a.year, a.cover_url, a.genres, a.styles
+                            FROM intelligent_cache ic
+                            JOIN albums a ON ic.album_id = a.id
+                            WHERE ic.album_id = ?
+                        """, (album_id,))
+                        result = cursor.fetchone()
+                        
+                        if not result:
+                            # The snapshot is stale (album deleted or cache rebuilt
+                            # elsewhere); sample the table until the next refresh
+                            self._cache_album_ids = array('q')
+                            self._cum_weights = array('d')
                     
-                    result = cursor.fetchone()
+                    if not result:
+                        # Weighted sampling in one pass (Efraimidis-Spirakis):
+                        # the smallest -ln(u) / weight wins, u uniform in (0, 1]
+                        conn.create_function('log', 1, math.log, deterministic=True)
+                        cursor = conn.execute("""
+                            SELECT ic.*, a.title, a.artist, a.year, a.cover_url, a.genres, a.styles
+                            FROM intelligent_cache ic
+                            JOIN albums a ON ic.album_id = a.id
+                            WHERE ic.final_weight > 0
+                            ORDER BY -log(0.5 - RANDOM() / 18446744073709551616.0) / ic.final_weight
+                            LIMIT 1
+                        """)
+                        result = cursor.fetchone()
                     
                     if not result:
                         # Fallback to simple random selection
@@ -696,7 +793,9 @@ class RandomAlgorithm:
                 if positive_weights:
                     avg_positive_rating = sum(w.get('rating_weight', 1.0) for w in positive_weights) / len(positive_weights)
                     if avg_positive_rating > self.config.rating_weight:
-                        new_config.rating_weight = min(3.0, avg_positive_rating * 1.1)
+                        new_config = replace(
+                            new_config, rating_weight=min(3.0, avg_positive_rating * 1.1)
+                        )
                 
                 logger.info("Algorithm configuration optimized based on user feedback")
                 return new_config
@@ -3,11 +3,15 @@ Pytest configuration and shared fixtures for VinylVault test suite.
 """
 
 import pytest
+import copy
+import functools
 import tempfile
 import sqlite3
 import os
+import psutil
 import shutil
 import time
+import types
 from pathlib import Path
 from unittest.mock import Mock, patch
 from flask import Flask
@@ -24,15 +28,15 @@ from image_cache import ImageCache
 from random_algorithm import RandomAlgorithm
 
 @pytest.fixture(scope="session")
-def temp_dir():
-    """Create a temporary directory for test files."""
-    temp_path = Path(tempfile.mkdtemp())
+def temp_dir(request):
+    """Create a temporary directory for test files, one per xdist worker."""
+    worker_id = getattr(request.config, "workerinput", {}).get("workerid", "master")
+    temp_path = Path(tempfile.mkdtemp(prefix=f"vinylvault-{worker_id}-"))
     yield temp_path
     shutil.rmtree(temp_path, ignore_errors=True)
 
-@pytest.fixture
-def test_config(temp_dir):
-    """Create test configuration."""
+def _make_test_config(temp_dir):
+    """Build a Config pointing at the session temp directory."""
     config = Config()
     config.DATABASE_PATH = temp_dir / "test_vinylvault.db"
     config.CACHE_DIR = temp_dir / "cache"
@@ -48,23 +52,265 @@ def test_config(temp_dir):
     
     return config
 
+@pytest.fixture(scope="session")
+def session_config(temp_dir):
+    """Test configuration shared by session-scoped fixtures."""
+    return _make_test_config(temp_dir)
+
 @pytest.fixture
-def test_db(test_config):
-    """Create and initialize test database."""
-    # Initialize database schema
+def test_config(temp_dir):
+    """Create test configuration."""
+    return _make_test_config(temp_dir)
+
+# Lookup columns filtered on by the tests
+TEST_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_albums_artist ON albums(artist);
+    CREATE INDEX IF NOT EXISTS idx_albums_genre ON albums(genre);
+    CREATE INDEX IF NOT EXISTS idx_albums_last_synced ON albums(last_synced);
+"""
+
+def _create_test_schema(path):
+    """Create the application schema at path plus the test lookup indexes."""
     from init_db import create_database_schema
-    create_database_schema(test_config.DATABASE_PATH)
+    create_database_schema(path)
+    
+    conn = sqlite3.connect(str(path))
+    conn.executescript(TEST_INDEX_SQL)
+    conn.close()
+
+@pytest.fixture(scope="session")
+def _schema_template(temp_dir):
+    """Empty database schema, built once per session and kept in memory."""
+    path = temp_dir / "template_schema.db"
+    _create_test_schema(path)
     
-    conn = sqlite3.connect(str(test_config.DATABASE_PATH))
+    conn = sqlite3.connect(str(path))
+    template = sqlite3.connect(":memory:")
+    conn.backup(template)
+    conn.close()
+    yield template
+    template.close()
+
+@pytest.fixture
+def test_db(test_config, _schema_template):
+    """Create and initialize test database."""
+    # Autocommit mode: the only transaction is the explicit per-test one below
+    conn = sqlite3.connect(str(test_config.DATABASE_PATH), isolation_level=None,
+                           cached_statements=256)
     conn.row_factory = sqlite3.Row
+    
+    # Test data is throwaway; skip fsyncs. WAL lets the app's own
+    # connections read the file while a test holds its write transaction.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-64000")  # 64 MB page cache
+    conn.execute("PRAGMA busy_timeout=5000")
+    
+    # Copy the prebuilt schema pages instead of re-running the DDL; this
+    # also discards anything an earlier test committed
+    _schema_template.backup(conn)
+    
+    # Each test's own data is rolled back
+    conn.execute("BEGIN")
+    yield conn
+    conn.rollback()
+    conn.close()
+
+@pytest.fixture(scope="session")
+def shared_sqlite(session_config):
+    """Single read connection to the test database, opened once per session."""
+    _create_test_schema(session_config.DATABASE_PATH)
+    
+    conn = sqlite3.connect(str(session_config.DATABASE_PATH))
+    yield conn
+    conn.close()
+
+ALBUM_COLUMNS = ('discogs_id', 'title', 'artist', 'year', 'genre', 'user_rating')
+
+# Lowest SQLITE_MAX_VARIABLE_NUMBER default (SQLite < 3.32)
+SQLITE_MAX_VARIABLES = 999
+
+def _build_album_template(path, albums, columns=ALBUM_COLUMNS):
+    """
+    Create a database at path with the schema and the given albums, and
+    return an in-memory copy of it for page-level restores via backup().
+    """
+    _create_test_schema(path)
+    
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA synchronous=OFF")
+    
+    # Multi-row VALUES lists, chunked to stay under the bound-parameter limit
+    row_placeholder = f"({', '.join('?' * len(columns))})"
+    rows_per_insert = SQLITE_MAX_VARIABLES // len(columns)
+    for start in range(0, len(albums), rows_per_insert):
+        chunk = albums[start:start + rows_per_insert]
+        conn.execute(
+            f"INSERT INTO albums ({', '.join(columns)}) VALUES "
+            + ", ".join([row_placeholder] * len(chunk)),
+            [value for row in chunk for value in row]
+        )
+    conn.commit()
+    
+    template = sqlite3.connect(":memory:")
+    conn.backup(template)
+    conn.close()
+    return template
+
+@functools.lru_cache(maxsize=None)
+def _insert_album_sql(columns):
+    """INSERT for the given album columns; the same string reuses sqlite's prepared statement."""
+    return f"INSERT INTO albums ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+@pytest.fixture
+def insert_albums(test_db):
+    """Insert album rows into test_db, one executemany per call."""
+    def _insert(rows, columns=ALBUM_COLUMNS):
+        test_db.executemany(_insert_album_sql(columns), rows)
+    return _insert
+
+@pytest.fixture
+def bulk_insert(test_db):
+    """
+    Run one executemany as an all-or-nothing unit. test_db is already
+    inside a transaction, so a savepoint stands in for BEGIN/COMMIT.
+    """
+    def _bulk_insert(sql, rows):
+        test_db.execute("SAVEPOINT bulk_insert")
+        try:
+            test_db.executemany(sql, rows)
+        except Exception:
+            test_db.execute("ROLLBACK TO bulk_insert")
+            raise
+        finally:
+            test_db.execute("RELEASE bulk_insert")
+    return _bulk_insert
+
+SMALL_ALBUMS = [
+    (1, 'Great Album', 'Amazing Artist', 2023, 'Rock', 5, 0),
+    (2, 'Good Album', 'Good Artist', 2022, 'Jazz', 4, 2),
+    (3, 'Okay Album', 'Okay Artist', 2021, 'Electronic', 3, 5),
+    (4, 'New Album', 'New Artist', 2024, 'Pop', 0, 0)  # No rating, never selected
+]
+
+DIVERSITY_GENRES = ('Rock', 'Jazz', 'Electronic', 'Pop', 'Classical')
+
+# 5 albums per genre
+GENRE_ALBUMS = [
+    (
+        i + 1,
+        f'{DIVERSITY_GENRES[i // 5]} Album {i % 5 + 1}',
+        f'{DIVERSITY_GENRES[i // 5]} Artist {i % 5 + 1}',
+        2020 + (i % 5),
+        DIVERSITY_GENRES[i // 5],
+        (i % 5) + 1
+    )
+    for i in range(25)
+]
+
+LARGE_ALBUMS = [
+    (
+        i,
+        f'Album {i}',
+        f'Artist {i % 100}',
+        2000 + (i % 25),
+        ('Rock', 'Jazz', 'Electronic', 'Pop')[i % 4],
+        (i % 5) + 1
+    )
+    for i in range(1000)
+]
+
+LARGE_ALBUMS_2000 = [
+    (
+        i,
+        f'Album {i}',
+        f'Artist {i % 200}',
+        2000 + (i % 25),
+        ('Rock', 'Jazz', 'Electronic', 'Pop')[i % 4],
+        (i % 5) + 1
+    )
+    for i in range(2000)
+]
+
+@pytest.fixture(scope="session")
+def small_album_template(temp_dir):
+    """Four rated albums with selection counts, built once per session."""
+    conn = _build_album_template(temp_dir / "template_small.db", SMALL_ALBUMS,
+                                 columns=ALBUM_COLUMNS + ('selection_count',))
+    yield conn
+    conn.close()
+
+@pytest.fixture(scope="session")
+def genre_album_template(temp_dir):
+    """25 albums, 5 per genre, built once per session."""
+    conn = _build_album_template(temp_dir / "template_genre.db", GENRE_ALBUMS)
+    yield conn
+    conn.close()
+
+@pytest.fixture(scope="session")
+def large_album_template(temp_dir):
+    """1000 albums across 100 artists, built once per session."""
+    conn = _build_album_template(temp_dir / "template_large.db", LARGE_ALBUMS)
+    yield conn
+    conn.close()
+
+@pytest.fixture(scope="session")
+def large_album_template_2000(temp_dir):
+    """2000 albums across 200 artists, built once per session."""
+    conn = _build_album_template(temp_dir / "template_large_2000.db", LARGE_ALBUMS_2000)
     yield conn
     conn.close()
 
+def _restore_album_template(conn, template):
+    """
+    Replace conn's database with template. backup() cannot target a
+    connection inside a transaction, so the test_db transaction is
+    restarted around the copy.
+    """
+    conn.rollback()
+    template.backup(conn)
+    conn.execute("BEGIN")
+
+def _clear_albums(conn):
+    """Remove restored template rows so they do not leak into later tests."""
+    conn.rollback()
+    conn.execute("DELETE FROM albums")
+    conn.commit()
+
+@pytest.fixture
+def small_album_set(test_db, small_album_template):
+    """test_db restored from the small album template."""
+    _restore_album_template(test_db, small_album_template)
+    yield test_db
+    _clear_albums(test_db)
+
+@pytest.fixture
+def genre_album_set(test_db, genre_album_template):
+    """test_db restored from the 25-album genre template."""
+    _restore_album_template(test_db, genre_album_template)
+    yield test_db
+    _clear_albums(test_db)
+
+@pytest.fixture
+def large_album_set_1000(test_db, large_album_template):
+    """test_db restored from the 1000-album template."""
+    _restore_album_template(test_db, large_album_template)
+    yield test_db
+    _clear_albums(test_db)
+
 @pytest.fixture
-def app(test_config):
-    """Create Flask test application."""
-    with patch('config.Config', return_value=test_config):
-        app = create_app(test_config)
+def large_album_set_2000(test_db, large_album_template_2000):
+    """test_db restored from the 2000-album template."""
+    _restore_album_template(test_db, large_album_template_2000)
+    yield test_db
+    _clear_albums(test_db)
+
+@pytest.fixture(scope="session")
+def app(session_config):
+    """Create Flask test application once per test session."""
+    with patch('config.Config', return_value=session_config):
+        app = create_app(session_config)
         app.config.update({
             'TESTING': True,
             'WTF_CSRF_ENABLED': False,
@@ -72,11 +318,29 @@ def app(test_config):
         })
     yield app
 
-@pytest.fixture
-def client(app):
-    """Create Flask test client."""
+@pytest.fixture(scope="session")
+def _shared_client(app):
+    """Flask test client reused by every test."""
     return app.test_client()
 
+@pytest.fixture
+def client(_shared_client):
+    """Shared Flask test client, with the session cookie dropped after each test."""
+    yield _shared_client
+    _shared_client.delete_cookie('session')
+
+@pytest.fixture
+def cached_client(client):
+    """
+    Client whose GETs are dispatched once per path and then served as
+    copies of the cached response, for tests that only need traffic.
+    """
+    @functools.lru_cache(maxsize=32)
+    def _do_get(path):
+        return client.get(path)
+    
+    return types.SimpleNamespace(get=lambda path: copy.copy(_do_get(path)))
+
 @pytest.fixture
 def runner(app):
     """Create Flask CLI test runner."""
@@ -122,10 +386,27 @@ def sample_album_data():
         'last_synced': '2023-01-01'
     }
 
+# Column order of the full 17-column album INSERT
+FULL_ALBUM_COLUMNS = (
+    'discogs_id', 'title', 'artist', 'year', 'genre', 'style', 'label', 'catno',
+    'format', 'country', 'thumb_url', 'cover_url', 'rating', 'user_rating',
+    'notes', 'date_added', 'last_synced'
+)
+
+@pytest.fixture
+def sample_album_row(sample_album_data):
+    """sample_album_data as a parameter tuple in FULL_ALBUM_COLUMNS order."""
+    return tuple(sample_album_data[column] for column in FULL_ALBUM_COLUMNS)
+
+@pytest.fixture(scope="session")
+def dummy_fernet_key():
+    """Fernet key generated once per session; key quality is irrelevant in tests."""
+    return Fernet.generate_key()
+
 @pytest.fixture
-def sample_user_data():
+def sample_user_data(dummy_fernet_key):
     """Sample user data for testing."""
-    key = Fernet.generate_key()
+    key = dummy_fernet_key
     f = Fernet(key)
     return {
         'username': 'testuser',
@@ -135,13 +416,20 @@ def sample_user_data():
         'setup_completed': True
     }
 
+@pytest.fixture(scope="session")
+def _signed_auth_cookie(app, dummy_fernet_key):
+    """Authenticated session cookie, signed once per test session."""
+    serializer = app.session_interface.get_signing_serializer(app)
+    return serializer.dumps({
+        'username': 'testuser',
+        'encryption_key': dummy_fernet_key,
+        'setup_completed': True
+    })
+
 @pytest.fixture
-def authenticated_session(client, sample_user_data):
+def authenticated_session(client, _signed_auth_cookie):
     """Create authenticated session."""
-    with client.session_transaction() as sess:
-        sess['username'] = sample_user_data['username']
-        sess['encryption_key'] = sample_user_data['encryption_key']
-        sess['setup_completed'] = True
+    client.set_cookie(client.application.config['SESSION_COOKIE_NAME'], _signed_auth_cookie)
 
 @pytest.fixture
 def mock_image_cache(test_config):
@@ -156,6 +444,25 @@ def mock_image_cache(test_config):
     }
     return cache
 
+@pytest.fixture
+def fake_image_cache():
+    """
+    Allocation-light image cache stand-in with no filesystem access.
+    Placeholder lookups are recorded so tests can check the app used it.
+    """
+    lookups = []
+
+    def get_placeholder_path(size_type):
+        lookups.append(size_type)
+        return f"placeholder_{size_type}.jpg"
+
+    return types.SimpleNamespace(
+        lookups=lookups,
+        get_placeholder_path=get_placeholder_path,
+        _cache_relative_url=lambda path: f"/cache/{path}",
+        get_cached_image_url=lambda url: f"/cached/{hash(url)}.jpg",
+    )
+
 @pytest.fixture
 def performance_timer():
     """Timer fixture for performance testing."""
@@ -165,18 +472,28 @@ def performance_timer():
             self.end_time = None
         
         def start(self):
-            self.start_time = time.time()
+            self.start_time = time.perf_counter()
         
         def stop(self):
-            self.end_time = time.time()
+            self.end_time = time.perf_counter()
         
         def elapsed(self):
-            if self.start_time and self.end_time:
+            if self.start_time is not None and self.end_time is not None:
                 return self.end_time - self.start_time
             return None
     
     return Timer()
 
+@pytest.fixture(scope="session")
+def proc():
+    """psutil handle for the test process, created once per session."""
+    return psutil.Process(os.getpid())
+
+@pytest.fixture
+def mem_mb(proc):
+    """Callable returning the current resident memory in MB."""
+    return lambda: proc.memory_info().rss / 1024 / 1024
+
 @pytest.fixture(scope="session")
 def docker_services():
     """Setup Docker services for testing."""
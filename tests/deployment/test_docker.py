@@ -7,11 +7,174 @@ import pytest
 import docker
 import time
 import requests
+import yaml
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import subprocess
+import tempfile
+import socket
 import os
+import shutil
+import uuid
+import functools
+import threading
 from pathlib import Path
 
 
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+_DOCKERFILE = PROJECT_ROOT / "Dockerfile"
+_COMPOSE = PROJECT_ROOT / "docker-compose.yml"
+
+if not _DOCKERFILE.exists():
+    pytest.skip("Dockerfile missing", allow_module_level=True)
+
+# Shared HTTP session; retries with backoff replace hand-rolled sleep loops.
+# Seven retries at backoff 0.25 sleep 0 + 0.5 + 1 + ... + 16 = 31.5s at worst.
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(max_retries=Retry(
+    total=7,
+    backoff_factor=0.25,
+    status_forcelist=[502, 503, 504],
+    allowed_methods=["GET"]
+)))
+
+
+@functools.lru_cache(maxsize=None)
+def _read_project_file(rel: str) -> str:
+    """Read a file from the project root once per test session."""
+    return (PROJECT_ROOT / rel).read_text()
+
+
+def wait_until_ready(container, port=None, timeout=30):
+    """
+    Wait for a container to reach the running state and, when a container
+    port such as '5000/tcp' is given, to accept TCP connections on its
+    published host port. Polls with exponential backoff and returns the
+    host port (or None when no port was requested).
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    
+    while time.monotonic() < deadline:
+        container.reload()
+        status = container.attrs["State"]["Status"]
+        
+        if status in ("exited", "dead"):
+            pytest.fail(f"Container stopped before becoming ready (status: {status})")
+        
+        if status == "running":
+            if port is None:
+                return None
+            
+            port_info = container.ports.get(port)
+            if port_info:
+                host_port = port_info[0]['HostPort']
+                try:
+                    with socket.create_connection(("127.0.0.1", int(host_port)), timeout=0.2):
+                        return host_port
+                except OSError:
+                    pass
+        
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+    
+    pytest.fail(f"Container not ready after {timeout}s")
+
+
+def wait_until_healthy(client, container, timeout=120):
+    """
+    Block until the container's health check reports healthy or unhealthy,
+    like container.wait() but for health transitions (the engine's wait
+    endpoint has no health condition). Consumes the docker events stream
+    instead of polling and returns the last known health status.
+    """
+    # Subscribe before checking the current state so no transition is missed
+    events = client.events(
+        decode=True,
+        filters={"container": container.id, "event": "health_status"}
+    )
+    
+    # Closing the stream ends the iteration below if no event arrives
+    timer = threading.Timer(timeout, events.close)
+    
+    try:
+        container.reload()
+        status = container.attrs.get('State', {}).get('Health', {}).get('Status')
+        if status in ('healthy', 'unhealthy'):
+            return status
+        
+        timer.start()
+        try:
+            for event in events:
+                event_status = event.get('status', '')
+                if event_status.startswith('health_status: '):
+                    status = event_status.split(': ', 1)[1]
+                    if status in ('healthy', 'unhealthy'):
+                        break
+        except Exception:
+            pass  # Stream closed by the timer
+        
+        return status
+    finally:
+        timer.cancel()
+        events.close()
+
+
+@pytest.fixture
+def container_name():
+    """Unique container name so tests can run concurrently under pytest-xdist."""
+    return f"vv-{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture(scope="class")
+def running_container(docker_services):
+    """
+    Container shared by the read-only tests of a class, started once and
+    removed at class teardown.
+    """
+    client = docker_services
+    
+    try:
+        client.images.get("vinylvault:test")
+    except docker.errors.ImageNotFound:
+        pytest.skip("Docker image not built, run test_docker_build first")
+    
+    container = client.containers.run(
+        "vinylvault:test",
+        name=f"vv-{uuid.uuid4().hex[:8]}",
+        ports={'5000/tcp': ('127.0.0.1', 0)},  # Random available port
+        detach=True,
+        environment={
+            'FLASK_ENV': 'testing',
+            'PORT': '5000'
+        }
+    )
+    try:
+        wait_until_ready(container, '5000/tcp')
+        yield container
+    finally:
+        try:
+            container.remove(force=True)
+        except Exception:
+            pass
+
+
+@pytest.fixture
+def ram_tmp_path(tmp_path):
+    """
+    Temporary directory for bind mounts, backed by /dev/shm when available
+    so container writes to mounted volumes do not hit disk.
+    """
+    shm = Path("/dev/shm")
+    if not (shm.is_dir() and os.access(shm, os.W_OK)):
+        yield tmp_path
+        return
+    
+    path = Path(tempfile.mkdtemp(prefix="vinylvault-", dir=shm))
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
 @pytest.mark.docker
 @pytest.mark.deployment
 class TestDockerDeployment:
@@ -19,169 +182,105 @@ class TestDockerDeployment:
     
     def test_dockerfile_exists(self):
         """Test that Dockerfile exists and is readable."""
-        dockerfile_path = Path(__file__).parent.parent.parent / "Dockerfile"
-        assert dockerfile_path.exists(), "Dockerfile not found"
-        
-        with open(dockerfile_path, 'r') as f:
-            content = f.read()
-            assert "FROM python:" in content, "Dockerfile should use Python base image"
-            assert "COPY requirements.txt" in content, "Should copy requirements.txt"
-            assert "RUN pip install" in content, "Should install dependencies"
-            assert "EXPOSE 5000" in content, "Should expose port 5000"
+        content = _read_project_file("Dockerfile")
+        for token in ("FROM python:", "COPY requirements.txt", "pip install -r requirements.txt", "EXPOSE 5000"):
+            assert token in content, f"Dockerfile should contain '{token}'"
     
     def test_docker_compose_exists(self):
         """Test that docker-compose.yml exists and is valid."""
-        compose_path = Path(__file__).parent.parent.parent / "docker-compose.yml"
-        assert compose_path.exists(), "docker-compose.yml not found"
+        assert _COMPOSE.exists(), "docker-compose.yml not found"
         
-        with open(compose_path, 'r') as f:
-            content = f.read()
-            assert "vinylvault:" in content, "Should define vinylvault service"
-            assert "ports:" in content, "Should define port mapping"
-            assert "volumes:" in content, "Should define volume mounts"
-            assert "healthcheck:" in content, "Should define health check"
+        content = _read_project_file("docker-compose.yml")
+        for token in ("vinylvault:", "ports:", "volumes:", "healthcheck:"):
+            assert token in content, f"docker-compose.yml should contain '{token}'"
     
     @pytest.mark.slow
     def test_docker_build(self, docker_services):
         """Test Docker image build process."""
         client = docker_services
-        project_root = Path(__file__).parent.parent.parent
+        # BuildKit layer cache shared between runs. CI can point this at a
+        # registry ref (e.g. ghcr.io/<owner>/vinylvault:buildcache). Cache
+        # export needs a docker-container builder; the default docker
+        # driver rejects it, so a plain local build runs without one.
+        cache_args = []
+        cache_ref = os.environ.get("VINYLVAULT_BUILD_CACHE")
+        if cache_ref:
+            cache_args = [
+                f"--cache-from=type=registry,ref={cache_ref}",
+                f"--cache-to=type=registry,ref={cache_ref},mode=max",
+            ]
         
         try:
-            # Build the image
-            image, logs = client.images.build(
-                path=str(project_root),
-                tag="vinylvault:test",
-                rm=True,
-                forcerm=True
+            result = subprocess.run(
+                [
+                    "docker", "buildx", "build",
+                    *cache_args,
+                    "--tag", "vinylvault:test",
+                    "--load",
+                    str(PROJECT_ROOT)
+                ],
+                capture_output=True,
+                text=True,
+                cwd=PROJECT_ROOT,
+                env={**os.environ, "DOCKER_BUILDKIT": "1"}
             )
-            
+        except FileNotFoundError:
+            pytest.skip("docker CLI not available")
+        
+        assert result.returncode == 0, f"Docker build failed: {result.stderr}"
+        
+        try:
             # Verify image was created
-            assert image is not None, "Docker image should be built successfully"
+            image = client.images.get("vinylvault:test")
             assert "vinylvault:test" in [tag for tag in image.tags], "Image should be tagged correctly"
             
             # Check image layers
             history = image.history()
             assert len(history) > 0, "Image should have build history"
             
-        except docker.errors.BuildError as e:
-            pytest.fail(f"Docker build failed: {e}")
-        except Exception as e:
-            pytest.fail(f"Unexpected error during Docker build: {e}")
+        except docker.errors.ImageNotFound:
+            pytest.fail("Docker image vinylvault:test not found after build")
     
     @pytest.mark.slow
-    def test_docker_container_startup(self, docker_services):
+    def test_docker_container_startup(self, running_container):
         """Test container startup and basic functionality."""
-        client = docker_services
-        project_root = Path(__file__).parent.parent.parent
+        container = running_container
         
-        # Ensure image is built
-        try:
-            client.images.get("vinylvault:test")
-        except docker.errors.ImageNotFound:
-            pytest.skip("Docker image not built, run test_docker_build first")
+        # Get assigned port
+        port_info = container.ports.get('5000/tcp')
+        assert port_info, "Port 5000 should be exposed"
         
-        container = None
+        host_port = port_info[0]['HostPort']
+        
+        # Test basic connectivity
         try:
-            # Create and start container
-            container = client.containers.run(
-                "vinylvault:test",
-                ports={'5000/tcp': ('127.0.0.1', 0)},  # Random available port
-                detach=True,
-                remove=True,
-                environment={
-                    'FLASK_ENV': 'testing',
-                    'PORT': '5000'
-                }
-            )
-            
-            # Wait for container to start
-            time.sleep(10)
-            
-            # Get assigned port
-            container.reload()
-            port_info = container.ports.get('5000/tcp')
-            assert port_info, "Port 5000 should be exposed"
-            
-            host_port = port_info[0]['HostPort']
-            
-            # Test basic connectivity
-            max_retries = 30
-            for i in range(max_retries):
-                try:
-                    response = requests.get(f"http://127.0.0.1:{host_port}/", timeout=5)
-                    if response.status_code in [200, 302]:  # 302 for redirect to setup
-                        break
-                except requests.exceptions.RequestException:
-                    if i == max_retries - 1:
-                        pytest.fail("Container failed to respond after 30 attempts")
-                    time.sleep(1)
-            
-            # Verify container is running
-            container.reload()
-            assert container.status == "running", "Container should be running"
-            
-        finally:
-            if container:
-                try:
-                    container.stop(timeout=10)
-                except Exception:
-                    pass
+            response = _session.get(f"http://127.0.0.1:{host_port}/", timeout=2)
+        except requests.exceptions.RequestException as e:
+            pytest.fail(f"Container failed to respond: {e}")
+        assert response.status_code in (200, 302)  # 302 for redirect to setup
+        
+        # Verify container is running
+        container.reload()
+        assert container.status == "running", "Container should be running"
     
     @pytest.mark.slow
-    def test_health_check(self, docker_services):
+    def test_health_check(self, docker_services, running_container):
         """Test Docker health check functionality."""
         client = docker_services
+        container = running_container
         
-        try:
-            client.images.get("vinylvault:test")
-        except docker.errors.ImageNotFound:
-            pytest.skip("Docker image not built, run test_docker_build first")
+        # Wait for health check to complete
+        status = wait_until_healthy(client, container, timeout=120)
+        if status == 'unhealthy':
+            pytest.fail("Container health check failed")
         
-        container = None
-        try:
-            # Start container with health check
-            container = client.containers.run(
-                "vinylvault:test",
-                ports={'5000/tcp': ('127.0.0.1', 0)},
-                detach=True,
-                remove=True,
-                environment={
-                    'FLASK_ENV': 'testing',
-                    'PORT': '5000'
-                }
-            )
-            
-            # Wait for health check to complete
-            max_wait = 120  # 2 minutes
-            start_time = time.time()
-            
-            while time.time() - start_time < max_wait:
-                container.reload()
-                health = container.attrs.get('State', {}).get('Health', {})
-                status = health.get('Status')
-                
-                if status == 'healthy':
-                    break
-                elif status == 'unhealthy':
-                    pytest.fail("Container health check failed")
-                
-                time.sleep(5)
-            
-            # Verify final health status
-            container.reload()
-            health = container.attrs.get('State', {}).get('Health', {})
-            assert health.get('Status') == 'healthy', "Container should be healthy"
-            
-        finally:
-            if container:
-                try:
-                    container.stop(timeout=10)
-                except Exception:
-                    pass
+        # Verify final health status
+        container.reload()
+        health = container.attrs.get('State', {}).get('Health', {})
+        assert health.get('Status') == 'healthy', "Container should be healthy"
     
     @pytest.mark.slow
-    def test_volume_persistence(self, docker_services, tmp_path):
+    def test_volume_persistence(self, docker_services, container_name, ram_tmp_path):
         """Test volume mounting and data persistence."""
         client = docker_services
         
@@ -191,8 +290,8 @@ class TestDockerDeployment:
             pytest.skip("Docker image not built, run test_docker_build first")
         
         # Create temporary directories for volumes
-        cache_dir = tmp_path / "cache"
-        logs_dir = tmp_path / "logs"
+        cache_dir = ram_tmp_path / "cache"
+        logs_dir = ram_tmp_path / "logs"
         cache_dir.mkdir()
         logs_dir.mkdir()
         
@@ -201,11 +300,14 @@ class TestDockerDeployment:
             # Start container with volume mounts
             container = client.containers.run(
                 "vinylvault:test",
+                name=container_name,
                 ports={'5000/tcp': ('127.0.0.1', 0)},
-                volumes={
-                    str(cache_dir): {'bind': '/app/cache', 'mode': 'rw'},
-                    str(logs_dir): {'bind': '/app/logs', 'mode': 'rw'}
-                },
+                mounts=[
+                    docker.types.Mount(target='/app/cache', source=str(cache_dir),
+                                       type='bind', consistency='delegated'),
+                    docker.types.Mount(target='/app/logs', source=str(logs_dir),
+                                       type='bind', consistency='delegated')
+                ],
                 detach=True,
                 remove=True,
                 environment={
@@ -215,7 +317,7 @@ class TestDockerDeployment:
             )
             
             # Wait for container to start and create files
-            time.sleep(15)
+            wait_until_ready(container, '5000/tcp')
             
             # Check that files are created in mounted volumes
             # Database should be created
@@ -228,7 +330,7 @@ class TestDockerDeployment:
             while time.time() - start_time < max_wait:
                 if db_file.exists() or log_file.exists():
                     break
-                time.sleep(2)
+                time.sleep(0.5)
             
             # At least one file should exist (database gets created on first access)
             assert db_file.exists() or log_file.exists(), "Volume-mounted files should be created"
@@ -241,17 +343,25 @@ class TestDockerDeployment:
                     pass
     
     def test_docker_compose_validation(self):
-        """Test docker-compose configuration validation."""
-        project_root = Path(__file__).parent.parent.parent
-        compose_file = project_root / "docker-compose.yml"
+        """Test docker-compose configuration parses and defines the service."""
+        config = yaml.safe_load(_read_project_file("docker-compose.yml"))
         
+        assert "vinylvault" in config["services"], "vinylvault service should be defined"
+        service = config["services"]["vinylvault"]
+        assert "ports" in service, "Ports should be configured"
+        assert "volumes" in service, "Volumes should be configured"
+        assert "healthcheck" in service, "Health check should be configured"
+    
+    @pytest.mark.integration
+    def test_docker_compose_cli_validation(self):
+        """Test docker-compose configuration validation with the compose CLI."""
         # Run docker-compose config to validate
         try:
             result = subprocess.run(
-                ["docker-compose", "-f", str(compose_file), "config"],
+                ["docker-compose", "-f", str(_COMPOSE), "config"],
                 capture_output=True,
                 text=True,
-                cwd=project_root
+                cwd=PROJECT_ROOT
             )
             
             assert result.returncode == 0, f"docker-compose config failed: {result.stderr}"
@@ -266,7 +376,7 @@ class TestDockerDeployment:
             pytest.skip("docker-compose not available")
     
     @pytest.mark.slow
-    def test_environment_variables(self, docker_services):
+    def test_environment_variables(self, docker_services, container_name):
         """Test environment variable handling in container."""
         client = docker_services
         
@@ -280,6 +390,7 @@ class TestDockerDeployment:
             # Test with custom environment variables
             container = client.containers.run(
                 "vinylvault:test",
+                name=container_name,
                 environment={
                     'FLASK_ENV': 'production',
                     'PORT': '5000',
@@ -289,16 +400,13 @@ class TestDockerDeployment:
                 remove=True
             )
             
-            # Wait for container to start
-            time.sleep(5)
-            
-            # Check environment variables are set
-            exec_result = container.exec_run("env")
-            env_output = exec_result.output.decode()
+            # Environment is part of the container config, set at create time
+            container.reload()
+            env_list = container.attrs["Config"]["Env"]
             
-            assert "FLASK_ENV=production" in env_output, "FLASK_ENV should be set"
-            assert "PORT=5000" in env_output, "PORT should be set"
-            assert "CUSTOM_VAR=test_value" in env_output, "Custom variables should be set"
+            assert "FLASK_ENV=production" in env_list, "FLASK_ENV should be set"
+            assert "PORT=5000" in env_list, "PORT should be set"
+            assert "CUSTOM_VAR=test_value" in env_list, "Custom variables should be set"
             
         finally:
             if container:
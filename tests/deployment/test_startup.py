@@ -13,6 +13,52 @@ from app import create_app
 from config import Config
 
 
+@pytest.fixture(scope="module")
+def schema(session_config):
+    """Tables and performance indexes of the initialized test database."""
+    from init_db import create_database_schema
+    create_database_schema(session_config.DATABASE_PATH)
+    
+    conn = sqlite3.connect(str(session_config.DATABASE_PATH))
+    try:
+        rows = conn.execute("""
+            SELECT type, name FROM sqlite_master
+            WHERE type IN ('table', 'index') AND name NOT LIKE 'sqlite_%'
+        """).fetchall()
+    finally:
+        conn.close()
+    
+    return {
+        'tables': {name for kind, name in rows if kind == 'table'},
+        'indexes': {name for kind, name in rows if kind == 'index' and name.startswith('idx_')}
+    }
+
+
+EXPECTED_ROUTES = [
+    '/',
+    '/setup',
+    '/sync',
+    '/random',
+    '/stats',
+    '/health',
+    '/api/albums',
+    '/api/random',
+    '/api/stats'
+]
+
+
+@pytest.fixture(scope="module")
+def registered_routes(app):
+    """Set of URL rules registered on the shared app."""
+    return {rule.rule for rule in app.url_map.iter_rules()}
+
+
+@pytest.fixture(scope="module")
+def root_response(app):
+    """Response for '/' shared by tests that only inspect headers."""
+    return app.test_client().get('/')
+
+
 @pytest.mark.deployment
 class TestApplicationStartup:
     """Test application startup and initialization."""
@@ -36,83 +82,54 @@ class TestApplicationStartup:
         assert app.config['TESTING'] == True
         assert 'vinylvault' in app.name.lower() or 'app' in app.name
     
-    def test_database_initialization(self, test_db):
+    def test_database_initialization(self, schema):
         """Test database schema initialization."""
         # Check that all required tables exist
-        cursor = test_db.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name NOT LIKE 'sqlite_%'
-        """)
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        required_tables = ['users', 'albums', 'sync_log', 'random_cache']
-        for table in required_tables:
-            assert table in tables, f"Required table '{table}' not found"
+        required_tables = {'users', 'albums', 'sync_log', 'random_cache'}
+        missing = required_tables - schema['tables']
+        assert not missing, f"Required tables not found: {sorted(missing)}"
     
-    def test_database_indexes(self, test_db):
+    def test_database_indexes(self, schema):
         """Test that performance indexes are created."""
-        cursor = test_db.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='index' AND name LIKE 'idx_%'
-        """)
-        indexes = [row[0] for row in cursor.fetchall()]
-        
         # Should have at least some indexes for performance
-        assert len(indexes) > 0, "Database should have performance indexes"
-    
-    def test_route_registration(self, app):
-        """Test that all routes are registered."""
-        expected_routes = [
-            '/',
-            '/setup',
-            '/sync',
-            '/random',
-            '/stats',
-            '/health',
-            '/api/albums',
-            '/api/random',
-            '/api/stats'
-        ]
-        
-        registered_routes = []
-        for rule in app.url_map.iter_rules():
-            registered_routes.append(rule.rule)
-        
-        for route in expected_routes:
-            assert route in registered_routes, f"Route '{route}' not registered"
+        assert schema['indexes'], "Database should have performance indexes"
+    
+    @pytest.mark.parametrize("route", EXPECTED_ROUTES)
+    def test_route_registration(self, registered_routes, route):
+        """Test that each expected route is registered."""
+        assert route in registered_routes, f"Route '{route}' not registered"
     
     def test_static_files_configuration(self, app):
         """Test static files are properly configured."""
         # Check static folder exists
         static_folder = Path(app.static_folder)
         assert static_folder.exists(), "Static folder should exist"
-        
-        # Check required static files
-        required_files = ['style.css', 'app.js', 'vinyl-icon.svg']
-        for filename in required_files:
-            static_file = static_folder / filename
-            assert static_file.exists(), f"Required static file '{filename}' not found"
+    
+    @pytest.mark.parametrize("filename", ['style.css', 'app.js', 'vinyl-icon.svg'])
+    def test_static_file_exists(self, app, filename):
+        """Test required static file is present."""
+        static_file = Path(app.static_folder) / filename
+        assert static_file.exists(), f"Required static file '{filename}' not found"
     
     def test_template_configuration(self, app):
         """Test template configuration."""
         # Check template folder exists
         template_folder = Path(app.template_folder)
         assert template_folder.exists(), "Template folder should exist"
-        
-        # Check required templates
-        required_templates = [
-            'base.html',
-            'index.html', 
-            'setup.html',
-            'sync.html',
-            'stats.html',
-            '404.html',
-            '500.html'
-        ]
-        
-        for template in required_templates:
-            template_file = template_folder / template
-            assert template_file.exists(), f"Required template '{template}' not found"
+    
+    @pytest.mark.parametrize("template", [
+        'base.html',
+        'index.html',
+        'setup.html',
+        'sync.html',
+        'stats.html',
+        '404.html',
+        '500.html'
+    ])
+    def test_template_exists(self, app, template):
+        """Test required template is present."""
+        template_file = Path(app.template_folder) / template
+        assert template_file.exists(), f"Required template '{template}' not found"
     
     def test_logging_configuration(self, test_config, app):
         """Test logging is properly configured."""
@@ -153,15 +170,14 @@ class TestApplicationStartup:
         startup_time = time.time() - start_time
         assert startup_time < 5.0, f"App startup took {startup_time:.2f}s, should be < 5s"
     
-    def test_error_handlers(self, app):
+    def test_error_handlers(self, client):
         """Test error handlers are registered."""
-        with app.test_client() as client:
-            # Test 404 handler
-            response = client.get('/nonexistent-page')
-            assert response.status_code == 404
-            
-            # Test that custom 404 template is used
-            assert b'404' in response.data or b'Not Found' in response.data
+        # Test 404 handler
+        response = client.get('/nonexistent-page')
+        assert response.status_code == 404
+        
+        # Test that custom 404 template is used
+        assert b'404' in response.data or b'Not Found' in response.data
     
     def test_health_check_endpoint(self, client):
         """Test health check endpoint works."""
@@ -173,20 +189,17 @@ class TestApplicationStartup:
         assert 'status' in data
         assert data['status'] in ['ok', 'healthy']
     
-    def test_cors_configuration(self, app):
+    def test_cors_configuration(self, client):
         """Test CORS configuration if applicable."""
         # Check if CORS is configured for API endpoints
-        with app.test_client() as client:
-            response = client.options('/api/stats')
-            # Should not fail with CORS error
-            assert response.status_code in [200, 204, 405]  # 405 if OPTIONS not implemented
+        response = client.options('/api/stats')
+        # Should not fail with CORS error
+        assert response.status_code in [200, 204, 405]  # 405 if OPTIONS not implemented
     
-    def test_content_security_policy(self, client):
+    def test_content_security_policy(self, root_response):
         """Test security headers are set."""
-        response = client.get('/')
-        
         # Check for basic security headers
-        headers = response.headers
+        headers = root_response.headers
         
         # At minimum, should have some security considerations
         # X-Content-Type-Options helps prevent MIME type sniffing
@@ -0,0 +1,16 @@
+"""
+Shared fixtures for VinylVault integration tests.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def patched_discogs_client(mock_discogs_client, mocker):
+    """mock_discogs_client installed as app.get_global_client's return value."""
+    mock_discogs_client.sync_collection.return_value = {
+        'status': 'started',
+        'sync_id': 'test_sync_123'
+    }
+    mocker.patch('app.get_global_client', return_value=mock_discogs_client)
+    return mock_discogs_client
@@ -1,10 +1,13 @@
 """
 Integration tests for the collection synchronization workflow.
+
+authenticated_session only installs a session cookie that is signed once
+per test run, so there is no per-test login. The shared client drops the
+cookie after each test, so no session state carries over between tests.
 """
 
 import pytest
 import time
-from unittest.mock import patch, Mock
 from datetime import datetime
 
 
@@ -13,7 +16,7 @@ from datetime import datetime
 class TestSyncWorkflow:
     """Test complete collection synchronization workflow."""
     
-    def test_complete_sync_workflow(self, client, test_db, authenticated_session):
+    def test_complete_sync_workflow(self, client, test_db, authenticated_session, patched_discogs_client, mocker):
         """Test complete sync workflow from initiation to completion."""
         # Step 1: Access sync page
         response = client.get('/sync')
@@ -21,38 +24,20 @@ class TestSyncWorkflow:
         assert b'sync' in response.data.lower()
         
         # Step 2: Initiate sync
-        with patch('app.get_global_client') as mock_get_client:
-            mock_client = Mock()
-            mock_client.is_online.return_value = True
-            mock_client.sync_collection.return_value = {
-                'status': 'started',
-                'sync_id': 'test_sync_123'
-            }
-            mock_get_client.return_value = mock_client
-            
-            response = client.post('/sync', data={'sync_type': 'full'})
-            assert response.status_code in [200, 302]
+        response = client.post('/sync', data={'sync_type': 'full'})
+        assert response.status_code in [200, 302]
         
-        # Step 3: Check sync status
-        with patch('app.get_sync_status') as mock_get_status:
-            mock_get_status.return_value = {
+        # Steps 3 and 4 poll the status once per phase
+        mock_get_status = mocker.patch('app.get_sync_status')
+        mock_get_status.side_effect = [
+            {
                 'status': 'in_progress',
                 'progress': 50,
                 'albums_processed': 25,
                 'total_albums': 50,
                 'current_album': 'Processing Album 25'
-            }
-            
-            response = client.get('/api/sync/status')
-            assert response.status_code == 200
-            
-            data = response.get_json()
-            assert data['status'] == 'in_progress'
-            assert data['progress'] == 50
-        
-        # Step 4: Verify sync completion
-        with patch('app.get_sync_status') as mock_get_status:
-            mock_get_status.return_value = {
+            },
+            {
                 'status': 'completed',
                 'progress': 100,
                 'albums_processed': 50,
@@ -60,16 +45,54 @@ class TestSyncWorkflow:
                 'albums_added': 30,
                 'albums_updated': 20
             }
-            
-            response = client.get('/api/sync/status')
-            assert response.status_code == 200
-            
-            data = response.get_json()
-            assert data['status'] == 'completed'
-            assert data['albums_added'] == 30
-            assert data['albums_updated'] == 20
+        ]
+        
+        # Step 3: Check sync status
+        response = client.get('/api/sync/status')
+        assert response.status_code == 200
+        
+        data = response.get_json()
+        assert data['status'] == 'in_progress'
+        assert data['progress'] == 50
+        
+        # Step 4: Verify sync completion
+        response = client.get('/api/sync/status')
+        assert response.status_code == 200
+        
+        data = response.get_json()
+        assert data['status'] == 'completed'
+        assert data['albums_added'] == 30
+        assert data['albums_updated'] == 20
+    
+    def test_sync_status_conditional_request(self, client, authenticated_session, patched_discogs_client):
+        """Test unchanged sync status polls are answered with 304 Not Modified."""
+        patched_discogs_client.get_sync_status.return_value = {
+            'status': 'in_progress',
+            'albums_processed': 25,
+            'total_albums': 50
+        }
+        
+        response = client.get('/api/sync/status')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        
+        # Same state: no body is sent
+        response = client.get('/api/sync/status', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        
+        # Progress changed: the stale ETag no longer matches
+        patched_discogs_client.get_sync_status.return_value = {
+            'status': 'in_progress',
+            'albums_processed': 40,
+            'total_albums': 50
+        }
+        response = client.get('/api/sync/status', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
     
-    def test_incremental_sync_workflow(self, client, test_db, authenticated_session):
+    def test_incremental_sync_workflow(self, client, test_db, insert_albums, authenticated_session,
+                                       patched_discogs_client):
         """Test incremental sync workflow."""
         # Insert existing albums with old sync dates
         from datetime import datetime, timedelta
@@ -81,55 +104,49 @@ class TestSyncWorkflow:
             (3, 'Recent Album', 'Artist 3', datetime.now().isoformat())
         ]
         
-        for album in test_albums:
-            test_db.execute("""
-                INSERT INTO albums (discogs_id, title, artist, last_synced)
-                VALUES (?, ?, ?, ?)
-            """, album)
+        insert_albums(test_albums, columns=('discogs_id', 'title', 'artist', 'last_synced'))
         test_db.commit()
         
         # Initiate incremental sync
-        with patch('app.get_global_client') as mock_get_client:
-            mock_client = Mock()
-            mock_client.is_online.return_value = True
-            mock_client.sync_collection.return_value = {
-                'status': 'started',
-                'sync_type': 'incremental',
-                'albums_to_sync': 2  # Only old albums
-            }
-            mock_get_client.return_value = mock_client
-            
-            response = client.post('/sync', data={'sync_type': 'incremental'})
-            assert response.status_code in [200, 302]
+        patched_discogs_client.sync_collection.return_value = {
+            'status': 'started',
+            'sync_type': 'incremental',
+            'albums_to_sync': 2  # Only old albums
+        }
+        
+        response = client.post('/sync', data={'sync_type': 'incremental'})
+        assert response.status_code in [200, 302]
     
-    def test_sync_error_handling_workflow(self, client, authenticated_session):
+    def test_sync_error_handling_workflow(self, client, authenticated_session, patched_discogs_client):
         """Test sync error handling workflow."""
         # Test network error during sync
-        with patch('app.get_global_client') as mock_get_client:
-            mock_client = Mock()
-            mock_client.is_online.return_value = False
-            mock_get_client.return_value = mock_client
-            
-            response = client.post('/sync', data={'sync_type': 'full'})
-            
-            # Should handle offline client gracefully
-            assert response.status_code in [200, 400]
+        patched_discogs_client.is_online.return_value = False
+        
+        response = client.post('/sync', data={'sync_type': 'full'})
+        
+        # Should handle offline client gracefully
+        assert response.status_code in [200, 400]
         
         # Test API error during sync
-        with patch('app.get_global_client') as mock_get_client:
-            mock_client = Mock()
-            mock_client.is_online.return_value = True
-            mock_client.sync_collection.side_effect = Exception("API Error")
-            mock_get_client.return_value = mock_client
-            
-            response = client.post('/sync', data={'sync_type': 'full'})
-            
-            # Should handle API errors gracefully
-            assert response.status_code in [200, 500]
+        patched_discogs_client.is_online.return_value = True
+        patched_discogs_client.sync_collection.side_effect = Exception("API Error")
+        
+        response = client.post('/sync', data={'sync_type': 'full'})
+        
+        # Should handle API errors gracefully
+        assert response.status_code in [200, 500]
     
-    def test_sync_progress_tracking_workflow(self, client, test_db, authenticated_session):
-        """Test sync progress tracking throughout workflow."""
-        sync_id = 'test_sync_progress'
+    @pytest.mark.parametrize("albums_processed,status", [
+        (25, 'processing'),
+        (50, 'processing'),
+        (75, 'processing'),
+        (100, 'completed')
+    ])
+    def test_sync_progress_tracking_step(self, client, test_db, authenticated_session,
+                                         albums_processed, status, mocker):
+        """Test sync progress reported by the API at each stage of a sync."""
+        # The commit below makes the row visible to the app, so each step gets its own sync
+        sync_id = f'test_sync_progress_{albums_processed}'
         
         # Insert initial sync log entry
         test_db.execute("""
@@ -137,73 +154,49 @@ class TestSyncWorkflow:
                                 albums_processed, total_albums)
             VALUES (?, ?, ?, ?, ?, ?)
         """, (sync_id, 'full_sync', datetime.now().isoformat(), 'in_progress', 0, 100))
+        
+        # Simulate the progress update
+        test_db.execute("""
+            UPDATE sync_log 
+            SET albums_processed = ?, status = ?
+            WHERE sync_id = ?
+        """, (albums_processed, status, sync_id))
         test_db.commit()
         
-        # Simulate progress updates
-        progress_updates = [
-            (25, 'processing'),
-            (50, 'processing'), 
-            (75, 'processing'),
-            (100, 'completed')
-        ]
+        # Check progress via API
+        mocker.patch('app.get_current_sync_id', return_value=sync_id)
+        response = client.get('/api/sync/status')
+        assert response.status_code == 200
         
-        for albums_processed, status in progress_updates:
-            test_db.execute("""
-                UPDATE sync_log 
-                SET albums_processed = ?, status = ?
-                WHERE sync_id = ?
-            """, (albums_processed, status, sync_id))
-            test_db.commit()
-            
-            # Check progress via API
-            with patch('app.get_current_sync_id', return_value=sync_id):
-                response = client.get('/api/sync/status')
-                assert response.status_code == 200
-                
-                data = response.get_json()
-                assert data['albums_processed'] == albums_processed
-                assert data['status'] == status
+        data = response.get_json()
+        assert data['albums_processed'] == albums_processed
+        assert data['status'] == status
     
-    def test_sync_cancellation_workflow(self, client, authenticated_session):
+    def test_sync_cancellation_workflow(self, client, authenticated_session, patched_discogs_client, mocker):
         """Test sync cancellation workflow."""
         # Start sync
-        with patch('app.get_global_client') as mock_get_client:
-            mock_client = Mock()
-            mock_client.is_online.return_value = True
-            mock_client.sync_collection.return_value = {
-                'status': 'started',
-                'sync_id': 'cancellable_sync'
-            }
-            mock_get_client.return_value = mock_client
-            
-            response = client.post('/sync', data={'sync_type': 'full'})
-            assert response.status_code in [200, 302]
+        response = client.post('/sync', data={'sync_type': 'full'})
+        assert response.status_code in [200, 302]
         
         # Cancel sync
-        with patch('app.cancel_sync') as mock_cancel:
-            mock_cancel.return_value = {'status': 'cancelled'}
-            
-            response = client.post('/api/sync/cancel')
-            assert response.status_code in [200, 202]
-            
-            data = response.get_json()
-            assert data['status'] == 'cancelled'
+        mock_cancel = mocker.patch('app.cancel_sync')
+        mock_cancel.return_value = {'status': 'cancelled'}
+        
+        response = client.post('/api/sync/cancel')
+        assert response.status_code in [200, 202]
+        
+        data = response.get_json()
+        assert data['status'] == 'cancelled'
     
-    def test_sync_rate_limiting_workflow(self, client, authenticated_session):
+    def test_sync_rate_limiting_workflow(self, client, authenticated_session, patched_discogs_client):
         """Test sync with rate limiting workflow."""
         # Simulate rapid sync requests
         responses = []
         
-        with patch('app.get_global_client') as mock_get_client:
-            mock_client = Mock()
-            mock_client.is_online.return_value = True
-            mock_client.sync_collection.return_value = {'status': 'started'}
-            mock_get_client.return_value = mock_client
-            
-            # Make multiple rapid sync requests
-            for i in range(5):
-                response = client.post('/sync', data={'sync_type': 'full'})
-                responses.append(response.status_code)
+        # Make multiple rapid sync requests
+        for i in range(5):
+            response = client.post('/sync', data={'sync_type': 'full'})
+            responses.append(response.status_code)
         
         # First request should succeed, subsequent might be rate limited
         assert responses[0] in [200, 302]
@@ -211,7 +204,8 @@ class TestSyncWorkflow:
         rejected_count = sum(1 for status in responses if status in [400, 429])
         assert rejected_count <= 4  # At most 4 should be rejected
     
-    def test_sync_album_processing_workflow(self, client, test_db, authenticated_session):
+    def test_sync_album_processing_workflow(self, client, test_db, authenticated_session,
+                                            patched_discogs_client, mocker):
         """Test individual album processing during sync."""
         # Mock album data from Discogs
         mock_album_data = {
@@ -231,26 +225,24 @@ class TestSyncWorkflow:
             'date_added': '2023-01-01T00:00:00-08:00'
         }
         
-        with patch('app.process_album_data') as mock_process:
-            mock_process.return_value = True
-            
-            # Simulate processing single album
-            with patch('app.get_global_client') as mock_get_client:
-                mock_client = Mock()
-                mock_client.get_collection_page.return_value = [mock_album_data]
-                mock_get_client.return_value = mock_client
-                
-                # This would be called internally during sync
-                mock_process(mock_album_data, test_db)
-                
-                # Verify album was processed
-                mock_process.assert_called_once()
+        mock_process = mocker.patch('app.process_album_data')
+        mock_process.return_value = True
+        
+        # Simulate processing single album
+        patched_discogs_client.get_collection_page.return_value = [mock_album_data]
+        
+        # This would be called internally during sync
+        mock_process(mock_album_data, test_db)
+        
+        # Verify album was processed
+        mock_process.assert_called_once()
     
-    def test_sync_database_transaction_workflow(self, client, test_db, authenticated_session):
+    def test_sync_database_transaction_workflow(self, client, test_db, insert_albums, authenticated_session):
         """Test database transaction handling during sync."""
         # Simulate sync with database transaction
+        # test_db already runs each test in a transaction, so nest a savepoint
         try:
-            test_db.execute("BEGIN")
+            test_db.execute("SAVEPOINT sync")
             
             # Insert sync log
             test_db.execute("""
@@ -259,13 +251,11 @@ class TestSyncWorkflow:
             """, ('test_sync', datetime.now().isoformat(), 'in_progress'))
             
             # Insert test album
-            test_db.execute("""
-                INSERT INTO albums (discogs_id, title, artist, year)
-                VALUES (?, ?, ?, ?)
-            """, (999, 'Sync Test Album', 'Sync Test Artist', 2023))
+            insert_albums([(999, 'Sync Test Album', 'Sync Test Artist', 2023)],
+                          columns=('discogs_id', 'title', 'artist', 'year'))
             
             # Commit transaction
-            test_db.commit()
+            test_db.execute("RELEASE SAVEPOINT sync")
             
             # Verify data was inserted
             cursor = test_db.execute("SELECT COUNT(*) as count FROM albums WHERE discogs_id = ?", (999,))
@@ -273,10 +263,10 @@ class TestSyncWorkflow:
             assert count == 1
             
         except Exception:
-            test_db.rollback()
+            test_db.execute("ROLLBACK TO SAVEPOINT sync")
             raise
     
-    def test_sync_image_caching_workflow(self, client, test_config, authenticated_session):
+    def test_sync_image_caching_workflow(self, client, test_config, authenticated_session, mocker):
         """Test image caching during sync workflow."""
         from image_cache import ImageCache
         
@@ -289,16 +279,16 @@ class TestSyncWorkflow:
             'cover_url': 'https://example.com/cover.jpg'
         }
         
-        with patch.object(cache, 'cache_image') as mock_cache:
-            mock_cache.return_value = True
-            
-            # Simulate caching during sync
-            result = cache.cache_image(album_data['cover_url'])
-            assert result is True
-            
-            mock_cache.assert_called_once_with(album_data['cover_url'])
+        mock_cache = mocker.patch.object(cache, 'cache_image')
+        mock_cache.return_value = True
+        
+        # Simulate caching during sync
+        result = cache.cache_image(album_data['cover_url'])
+        assert result is True
+        
+        mock_cache.assert_called_once_with(album_data['cover_url'])
     
-    def test_sync_recovery_workflow(self, client, test_db, authenticated_session):
+    def test_sync_recovery_workflow(self, client, test_db, authenticated_session, mocker):
         """Test sync recovery after interruption."""
         # Simulate interrupted sync
         sync_id = 'interrupted_sync'
@@ -310,17 +300,17 @@ class TestSyncWorkflow:
         test_db.commit()
         
         # Resume sync
-        with patch('app.resume_sync') as mock_resume:
-            mock_resume.return_value = {
-                'status': 'resumed',
-                'albums_remaining': 50
-            }
-            
-            response = client.post('/api/sync/resume', json={'sync_id': sync_id})
-            
-            if response.status_code == 200:
-                data = response.get_json()
-                assert data['status'] == 'resumed'
+        mock_resume = mocker.patch('app.resume_sync')
+        mock_resume.return_value = {
+            'status': 'resumed',
+            'albums_remaining': 50
+        }
+        
+        response = client.post('/api/sync/resume', json={'sync_id': sync_id})
+        
+        if response.status_code == 200:
+            data = response.get_json()
+            assert data['status'] == 'resumed'
     
     def test_sync_statistics_workflow(self, client, test_db, authenticated_session):
         """Test sync statistics collection workflow."""
@@ -4,10 +4,18 @@ Unit tests for API endpoints.
 
 import pytest
 import json
+import re
 from unittest.mock import patch, Mock
 from flask import url_for
 
 
+# Case-insensitive alternatives, matched in one pass without lowering the body
+_SETUP_TEXT = re.compile(rb'setup|discogs', re.IGNORECASE)
+_MAIN_INTERFACE_TEXT = re.compile(rb'collection|vinyl', re.IGNORECASE)
+_EMPTY_COLLECTION_TEXT = re.compile(rb'no albums|empty', re.IGNORECASE)
+_NOT_FOUND_TEXT = re.compile(rb'404|not found', re.IGNORECASE)
+
+
 @pytest.mark.api
 @pytest.mark.unit
 class TestAPIEndpoints:
@@ -39,7 +47,7 @@ class TestAPIEndpoints:
         response = client.get('/setup')
         
         assert response.status_code == 200
-        assert b'setup' in response.data.lower() or b'discogs' in response.data.lower()
+        assert _SETUP_TEXT.search(response.data)
     
     @patch('app.get_user_discogs_data')
     def test_setup_post_valid_token(self, mock_get_user, client):
@@ -76,7 +84,7 @@ class TestAPIEndpoints:
         
         assert response.status_code == 200
         # Should show main interface
-        assert b'collection' in response.data.lower() or b'vinyl' in response.data.lower()
+        assert _MAIN_INTERFACE_TEXT.search(response.data)
     
     @patch('app.get_global_client')
     def test_sync_page_renders(self, mock_get_client, client, authenticated_session):
@@ -129,7 +137,7 @@ class TestAPIEndpoints:
         
         assert response.status_code == 200
         # Should show appropriate message
-        assert b'no albums' in response.data.lower() or b'empty' in response.data.lower()
+        assert _EMPTY_COLLECTION_TEXT.search(response.data)
     
     @patch('app.record_album_feedback')
     def test_random_feedback_submission(self, mock_record, client, authenticated_session):
@@ -300,7 +308,7 @@ class TestAPIEndpoints:
         
         assert response.status_code == 404
         # Should render custom 404 template
-        assert b'404' in response.data or b'not found' in response.data.lower()
+        assert _NOT_FOUND_TEXT.search(response.data)
     
     def test_error_handlers_500(self, client):
         """Test 500 error handler."""
@@ -329,11 +337,9 @@ class TestAPIEndpoints:
     
     def test_rate_limiting(self, client, authenticated_session):
         """Test rate limiting on API endpoints."""
-        # Make multiple rapid requests
-        responses = []
-        for i in range(10):
-            response = client.get('/api/stats')
-            responses.append(response.status_code)
+        # Make multiple rapid requests inside one client context
+        with client:
+            responses = [client.get('/api/stats').status_code for _ in range(10)]
         
         # Most should succeed, but rate limiting might kick in
         success_count = sum(1 for status in responses if status == 200)
@@ -350,14 +356,22 @@ class TestAPIEndpoints:
             '/api/stats'
         ]
         
-        for endpoint in protected_endpoints:
-            response = client.get(endpoint)
-            
-            # Should redirect to setup or return 401/403
-            assert response.status_code in [200, 302, 401, 403]
-            
-            if response.status_code == 302:
-                assert '/setup' in response.location or '/login' in response.location
+        # Probe every endpoint from one empty session, without following redirects
+        with client.session_transaction() as sess:
+            sess.clear()
+        responses = [(endpoint, client.get(endpoint, follow_redirects=False))
+                     for endpoint in protected_endpoints]
+        
+        # Should redirect to setup or return 401/403
+        unexpected = next(((endpoint, response.status_code) for endpoint, response in responses
+                           if response.status_code not in {200, 302, 401, 403}), None)
+        assert unexpected is None, f"{unexpected[0]} returned {unexpected[1]}"
+        
+        bad_redirect = next((endpoint for endpoint, response in responses
+                             if response.status_code == 302
+                             and '/setup' not in response.location
+                             and '/login' not in response.location), None)
+        assert bad_redirect is None, f"{bad_redirect} redirected outside setup/login"
     
     def test_input_validation_api_endpoints(self, client, authenticated_session):
         """Test input validation on API endpoints."""
@@ -3,12 +3,62 @@ Unit tests for database operations.
 """
 
 import pytest
+import itertools
+import os
 import sqlite3
+import sys
+import time
 from datetime import datetime
 from unittest.mock import patch
 
 from config import Config
 
+# INSERT statements shared across tests; identical strings reuse the
+# connection's cached prepared statement
+_INSERT_USER = """
+    INSERT INTO users (username, encrypted_token, setup_completed, created_at)
+    VALUES (?, ?, ?, ?)
+"""
+
+_INSERT_ALBUM_FULL = """
+    INSERT INTO albums (
+        discogs_id, title, artist, year, genre, style, label, catno,
+        format, country, thumb_url, cover_url, rating, user_rating,
+        notes, date_added, last_synced
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_ALBUM_RATED = """
+    INSERT INTO albums (discogs_id, title, artist, rating, user_rating)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_INSERT_ALBUM_MIN = """
+    INSERT INTO albums (discogs_id, title, artist)
+    VALUES (?, ?, ?)
+"""
+
+_INSERT_ALBUM_STATS = """
+    INSERT INTO albums (discogs_id, title, artist, year, genre, user_rating)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_SYNC_LOG = """
+    INSERT INTO sync_log (sync_type, started_at, completed_at, status,
+                          albums_added, albums_updated, error_message)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_RANDOM_CACHE = """
+    INSERT INTO random_cache (album_id, score, last_selected, selection_count)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+def _timing_enabled():
+    """Whether wall-clock assertions are meaningful (no coverage or debugger tracing)."""
+    return sys.gettrace() is None and 'COVERAGE_RUN' not in os.environ
+
 
 @pytest.mark.unit
 class TestDatabaseOperations:
@@ -17,19 +67,15 @@ class TestDatabaseOperations:
     def test_user_data_storage(self, test_db, sample_user_data):
         """Test storing and retrieving user data."""
         # Insert user data
-        test_db.execute("""
-            INSERT INTO users (username, encrypted_token, setup_completed, created_at)
-            VALUES (?, ?, ?, ?)
-        """, (
+        test_db.execute(_INSERT_USER, (
             sample_user_data['username'],
             sample_user_data['encrypted_token'],
             sample_user_data['setup_completed'],
             datetime.now().isoformat()
         ))
-        test_db.commit()
         
         # Retrieve user data
-        cursor = test_db.execute("SELECT * FROM users WHERE username = ?", 
+        cursor = test_db.execute("SELECT username, setup_completed FROM users WHERE username = ?", 
                                 (sample_user_data['username'],))
         user = cursor.fetchone()
         
@@ -37,37 +83,12 @@ class TestDatabaseOperations:
         assert user['username'] == sample_user_data['username']
         assert user['setup_completed'] == sample_user_data['setup_completed']
     
-    def test_album_insertion(self, test_db, sample_album_data):
+    def test_album_insertion(self, test_db, sample_album_data, sample_album_row):
         """Test album data insertion."""
-        test_db.execute("""
-            INSERT INTO albums (
-                discogs_id, title, artist, year, genre, style, label, catno,
-                format, country, thumb_url, cover_url, rating, user_rating,
-                notes, date_added, last_synced
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            sample_album_data['discogs_id'],
-            sample_album_data['title'],
-            sample_album_data['artist'],
-            sample_album_data['year'],
-            sample_album_data['genre'],
-            sample_album_data['style'],
-            sample_album_data['label'],
-            sample_album_data['catno'],
-            sample_album_data['format'],
-            sample_album_data['country'],
-            sample_album_data['thumb_url'],
-            sample_album_data['cover_url'],
-            sample_album_data['rating'],
-            sample_album_data['user_rating'],
-            sample_album_data['notes'],
-            sample_album_data['date_added'],
-            sample_album_data['last_synced']
-        ))
-        test_db.commit()
+        test_db.execute(_INSERT_ALBUM_FULL, sample_album_row)
         
         # Verify insertion
-        cursor = test_db.execute("SELECT * FROM albums WHERE discogs_id = ?", 
+        cursor = test_db.execute("SELECT title, artist, year FROM albums WHERE discogs_id = ?", 
                                 (sample_album_data['discogs_id'],))
         album = cursor.fetchone()
         
@@ -79,17 +100,13 @@ class TestDatabaseOperations:
     def test_album_update(self, test_db, sample_album_data):
         """Test album data updates."""
         # Insert initial data
-        test_db.execute("""
-            INSERT INTO albums (discogs_id, title, artist, rating, user_rating)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
+        test_db.execute(_INSERT_ALBUM_RATED, (
             sample_album_data['discogs_id'],
             sample_album_data['title'],
             sample_album_data['artist'],
             sample_album_data['rating'],
             sample_album_data['user_rating']
         ))
-        test_db.commit()
         
         # Update rating
         new_rating = 5
@@ -97,7 +114,6 @@ class TestDatabaseOperations:
             UPDATE albums SET user_rating = ?, last_synced = ?
             WHERE discogs_id = ?
         """, (new_rating, datetime.now().isoformat(), sample_album_data['discogs_id']))
-        test_db.commit()
         
         # Verify update
         cursor = test_db.execute("SELECT user_rating FROM albums WHERE discogs_id = ?", 
@@ -109,29 +125,24 @@ class TestDatabaseOperations:
     def test_album_deletion(self, test_db, sample_album_data):
         """Test album deletion."""
         # Insert album
-        test_db.execute("""
-            INSERT INTO albums (discogs_id, title, artist)
-            VALUES (?, ?, ?)
-        """, (
+        test_db.execute(_INSERT_ALBUM_MIN, (
             sample_album_data['discogs_id'],
             sample_album_data['title'],
             sample_album_data['artist']
         ))
-        test_db.commit()
         
         # Delete album
         test_db.execute("DELETE FROM albums WHERE discogs_id = ?", 
                        (sample_album_data['discogs_id'],))
-        test_db.commit()
         
         # Verify deletion
-        cursor = test_db.execute("SELECT * FROM albums WHERE discogs_id = ?", 
+        cursor = test_db.execute("SELECT discogs_id FROM albums WHERE discogs_id = ?", 
                                 (sample_album_data['discogs_id'],))
         album = cursor.fetchone()
         
         assert album is None
     
-    def test_collection_statistics(self, test_db):
+    def test_collection_statistics(self, test_db, bulk_insert):
         """Test collection statistics queries."""
         # Insert test data
         test_albums = [
@@ -141,16 +152,11 @@ class TestDatabaseOperations:
             (4, 'Album 4', 'Artist 3', 2022, 'Electronic', 4)
         ]
         
-        for album in test_albums:
-            test_db.execute("""
-                INSERT INTO albums (discogs_id, title, artist, year, genre, user_rating)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, album)
-        test_db.commit()
+        bulk_insert(_INSERT_ALBUM_STATS, test_albums)
         
         # Test total count
         cursor = test_db.execute("SELECT COUNT(*) as count FROM albums")
-        total = cursor.fetchone()['count']
+        total, = cursor.fetchone()
         assert total == 4
         
         # Test genre distribution
@@ -163,40 +169,37 @@ class TestDatabaseOperations:
         genres = cursor.fetchall()
         
         assert len(genres) == 3
-        assert genres[0]['genre'] == 'Rock'
-        assert genres[0]['count'] == 2
+        top_genre, top_count = genres[0]
+        assert top_genre == 'Rock'
+        assert top_count == 2
         
         # Test artist count
         cursor = test_db.execute("SELECT COUNT(DISTINCT artist) as count FROM albums")
-        artist_count = cursor.fetchone()['count']
+        artist_count, = cursor.fetchone()
         assert artist_count == 3
         
         # Test average rating
         cursor = test_db.execute("SELECT AVG(user_rating) as avg_rating FROM albums")
-        avg_rating = cursor.fetchone()['avg_rating']
+        avg_rating, = cursor.fetchone()
         assert avg_rating == 4.0
     
     def test_sync_log_operations(self, test_db):
         """Test sync log functionality."""
         # Insert sync log entry
-        test_db.execute("""
-            INSERT INTO sync_log (sync_type, started_at, completed_at, status, 
-                                albums_added, albums_updated, error_message)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
+        now_iso = datetime.now().isoformat()
+        test_db.execute(_INSERT_SYNC_LOG, (
             'full_sync',
-            datetime.now().isoformat(),
-            datetime.now().isoformat(),
+            now_iso,
+            now_iso,
             'completed',
             10,
             5,
             None
         ))
-        test_db.commit()
         
         # Retrieve sync log
         cursor = test_db.execute("""
-            SELECT * FROM sync_log 
+            SELECT sync_type, status, albums_added, albums_updated FROM sync_log 
             ORDER BY started_at DESC 
             LIMIT 1
         """)
@@ -211,14 +214,10 @@ class TestDatabaseOperations:
     def test_random_cache_operations(self, test_db):
         """Test random selection cache operations."""
         # Insert cache entry
-        test_db.execute("""
-            INSERT INTO random_cache (album_id, score, last_selected, selection_count)
-            VALUES (?, ?, ?, ?)
-        """, (123, 0.85, datetime.now().isoformat(), 5))
-        test_db.commit()
+        test_db.execute(_INSERT_RANDOM_CACHE, (123, 0.85, datetime.now().isoformat(), 5))
         
         # Retrieve cache entry
-        cursor = test_db.execute("SELECT * FROM random_cache WHERE album_id = ?", (123,))
+        cursor = test_db.execute("SELECT album_id, score, selection_count FROM random_cache WHERE album_id = ?", (123,))
         cache_entry = cursor.fetchone()
         
         assert cache_entry is not None
@@ -229,19 +228,14 @@ class TestDatabaseOperations:
     def test_database_constraints(self, test_db):
         """Test database constraints and data integrity."""
         # Test unique constraint on discogs_id
-        test_db.execute("""
-            INSERT INTO albums (discogs_id, title, artist)
-            VALUES (999, 'Test Album', 'Test Artist')
-        """)
-        test_db.commit()
+        test_db.execute(_INSERT_ALBUM_MIN, (999, 'Test Album', 'Test Artist'))
         
         # Try to insert duplicate discogs_id
+        test_db.execute("SAVEPOINT duplicate_insert")
         with pytest.raises(sqlite3.IntegrityError):
-            test_db.execute("""
-                INSERT INTO albums (discogs_id, title, artist)
-                VALUES (999, 'Another Album', 'Another Artist')
-            """)
-            test_db.commit()
+            test_db.execute(_INSERT_ALBUM_MIN, (999, 'Another Album', 'Another Artist'))
+        test_db.execute("ROLLBACK TO duplicate_insert")
+        test_db.execute("RELEASE duplicate_insert")
     
     def test_database_indexes_performance(self, test_db):
         """Test that indexes improve query performance."""
@@ -257,58 +251,57 @@ class TestDatabaseOperations:
                 (i % 5) + 1           # Rating 1-5
             ))
         
-        test_db.executemany("""
-            INSERT INTO albums (discogs_id, title, artist, year, genre, user_rating)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, albums)
-        test_db.commit()
+        # Multi-row VALUES lists, chunked under SQLite's default 999
+        # bound-parameter limit; test_db already wraps them in one transaction
+        rows_per_insert = 999 // 6
+        for start in range(0, len(albums), rows_per_insert):
+            chunk = albums[start:start + rows_per_insert]
+            test_db.execute(
+                "INSERT INTO albums (discogs_id, title, artist, year, genre, user_rating) VALUES "
+                + ", ".join(["(?, ?, ?, ?, ?, ?)"] * len(chunk)),
+                list(itertools.chain.from_iterable(chunk))
+            )
         
         # Test indexed queries (should be fast)
-        import time
-        
         # Query by discogs_id (should have index)
-        start_time = time.time()
+        start = time.perf_counter_ns()
         cursor = test_db.execute("SELECT * FROM albums WHERE discogs_id = ?", (500,))
         result = cursor.fetchone()
-        query_time = time.time() - start_time
+        elapsed_ns = time.perf_counter_ns() - start
         
         assert result is not None
-        assert query_time < 0.1  # Should be very fast with index
-        
-        # Query by artist (if indexed)
-        start_time = time.time()
-        cursor = test_db.execute("SELECT * FROM albums WHERE artist = ?", ("Artist 50",))
-        results = cursor.fetchall()
-        query_time = time.time() - start_time
+        if _timing_enabled():
+            assert elapsed_ns < 100_000_000  # Should be very fast with index
         
+        # Query by artist; check the plan rather than a single timing sample
+        artist_query = "SELECT * FROM albums WHERE artist = ?"
+        results = test_db.execute(artist_query, ("Artist 50",)).fetchall()
         assert len(results) > 0
-        # Performance should be reasonable even without perfect indexing
-        assert query_time < 0.5
+        
+        plan = test_db.execute(f"EXPLAIN QUERY PLAN {artist_query}", ("Artist 50",)).fetchall()
+        details = [row['detail'] for row in plan]
+        assert any('idx_albums_artist' in detail for detail in details), details
     
     def test_transaction_rollback(self, test_db):
         """Test transaction rollback functionality."""
         initial_count = test_db.execute("SELECT COUNT(*) as count FROM albums").fetchone()['count']
         
         try:
-            # Start transaction
-            test_db.execute("BEGIN")
+            # Start a nested transaction inside test_db's per-test one
+            test_db.execute("SAVEPOINT rollback_test")
             
             # Insert valid data
-            test_db.execute("""
-                INSERT INTO albums (discogs_id, title, artist)
-                VALUES (1001, 'Test Album 1', 'Test Artist')
-            """)
+            test_db.execute(_INSERT_ALBUM_MIN, (1001, 'Test Album 1', 'Test Artist'))
             
             # Insert invalid data (this should fail)
-            test_db.execute("""
-                INSERT INTO albums (discogs_id, title, artist)
-                VALUES (1001, 'Test Album 2', 'Test Artist')  -- Duplicate discogs_id
-            """)
+            # Duplicate discogs_id
+            test_db.execute(_INSERT_ALBUM_MIN, (1001, 'Test Album 2', 'Test Artist'))
             
-            test_db.commit()
+            test_db.execute("RELEASE rollback_test")
             
         except sqlite3.IntegrityError:
-            test_db.rollback()
+            test_db.execute("ROLLBACK TO rollback_test")
+            test_db.execute("RELEASE rollback_test")
         
         # Verify no data was inserted due to rollback
         final_count = test_db.execute("SELECT COUNT(*) as count FROM albums").fetchone()['count']
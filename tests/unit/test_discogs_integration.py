@@ -3,12 +3,12 @@ Unit tests for Discogs integration functionality.
 """
 
 import pytest
+import time
 from unittest.mock import Mock, patch, MagicMock
-import responses
 import json
 from datetime import datetime
 
-from discogs_client import (
+from discogs_custom_client import (
     create_discogs_client,
     DiscogsAPIError,
     DiscogsConnectionError,
@@ -29,107 +29,53 @@ class TestDiscogsIntegration:
         assert hasattr(client, 'get_collection_stats')
         assert hasattr(client, 'sync_collection')
     
-    def test_rate_limiter_initialization(self):
-        """Test rate limiter initialization."""
-        limiter = DiscogsRateLimiter(max_requests=60, window=60)
+    @pytest.mark.parametrize("max_requests,window,n_calls", [
+        pytest.param(60, 60, 0, id='initialization'),
+        pytest.param(5, 60, 5, id='within_limit'),
+        pytest.param(2, 10, 2, id='at_limit'),
+    ])
+    def test_rate_limiter(self, monkeypatch, max_requests, window, n_calls):
+        """Test rate limiter lets requests through up to its limit without waiting."""
+        sleeps = []
+        monkeypatch.setattr(time, 'sleep', sleeps.append)
+        limiter = DiscogsRateLimiter(max_requests=max_requests, window=window)
+        
+        assert limiter.max_requests == max_requests
+        assert limiter.window == window
+        
+        for _ in range(n_calls):
+            limiter.wait_if_needed()  # Should not block
         
-        assert limiter.max_requests == 60
-        assert limiter.window == 60
-        assert limiter.requests == []
+        assert sleeps == []
+        assert len(limiter.requests) == n_calls
     
-    def test_rate_limiter_allows_requests_within_limit(self):
-        """Test rate limiter allows requests within limit."""
-        limiter = DiscogsRateLimiter(max_requests=5, window=60)
+    def test_rate_limiter_blocks_excess_requests(self, monkeypatch):
+        """Test rate limiter sleeps until the oldest request leaves the window."""
+        clock = [1000.0]
+        sleeps = []
         
-        # Should allow requests within limit
-        for i in range(5):
-            limiter.wait_if_needed()  # Should not block
-    
-    def test_rate_limiter_blocks_excess_requests(self):
-        """Test rate limiter blocks excess requests."""
-        import time
+        def fake_sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
         
+        monkeypatch.setattr(time, 'time', lambda: clock[0])
+        monkeypatch.setattr(time, 'sleep', fake_sleep)
         limiter = DiscogsRateLimiter(max_requests=2, window=10)
         
-        # First two requests should be immediate
-        start_time = time.time()
         limiter.wait_if_needed()
         limiter.wait_if_needed()
-        elapsed = time.time() - start_time
-        
-        assert elapsed < 1.0  # Should be nearly instant
+        clock[0] += 3  # Oldest request is now 3s old
+        limiter.wait_if_needed()
         
-        # Third request should be delayed (but we won't wait for it in test)
-        # Just verify the limiter knows it would need to wait
-        assert len(limiter.requests) == 2
+        # Waits out the rest of the window, plus the limiter's small buffer
+        assert sleeps == [pytest.approx(10 - 3, abs=0.5)]
+        assert list(limiter.requests) == [clock[0]]
     
-    @responses.activate
-    def test_discogs_api_authentication(self, sample_user_data):
-        """Test Discogs API authentication."""
-        # Mock successful authentication response
-        responses.add(
-            responses.GET,
-            'https://api.discogs.com/oauth/identity',
-            json={'username': sample_user_data['username'], 'id': 12345},
-            status=200
-        )
-        
-        with patch('discogs_client.get_user_discogs_data') as mock_get_user:
-            mock_get_user.return_value = (
-                sample_user_data['username'],
-                sample_user_data['encrypted_token']
-            )
-            
-            with patch('discogs_client.Fernet') as mock_fernet:
-                mock_fernet.return_value.decrypt.return_value = sample_user_data['token'].encode()
-                
-                # This would test actual authentication
-                # In a real test, we'd need to mock the Discogs client initialization
-                pass
+    @pytest.mark.skip(reason="pending client implementation")
+    def test_discogs_network_paths_pending(self):
+        """Placeholder for authentication, collection fetch, rate limit (429) and timeout handling."""
     
-    @responses.activate
-    def test_collection_fetch(self):
-        """Test fetching user collection from Discogs."""
-        # Mock collection response
-        collection_response = {
-            'releases': [
-                {
-                    'id': 123456,
-                    'basic_information': {
-                        'title': 'Test Album',
-                        'artists': [{'name': 'Test Artist'}],
-                        'year': 2023,
-                        'genres': ['Rock'],
-                        'styles': ['Alternative Rock'],
-                        'labels': [{'name': 'Test Records', 'catno': 'TEST001'}],
-                        'formats': [{'name': 'Vinyl', 'descriptions': ['LP']}],
-                        'thumb': 'https://example.com/thumb.jpg',
-                        'cover_image': 'https://example.com/cover.jpg'
-                    },
-                    'rating': 4,
-                    'date_added': '2023-01-01T00:00:00-08:00'
-                }
-            ],
-            'pagination': {
-                'page': 1,
-                'pages': 1,
-                'per_page': 50,
-                'items': 1
-            }
-        }
-        
-        responses.add(
-            responses.GET,
-            'https://api.discogs.com/users/testuser/collection/folders/0/releases',
-            json=collection_response,
-            status=200
-        )
-        
-        # Test would involve actual collection fetching
-        # Mock the client and test the response parsing
-        pass
-    
-    def test_collection_stats_calculation(self, test_db):
+    def test_collection_stats_calculation(self, test_db, bulk_insert):
         """Test collection statistics calculation."""
         # Insert test data
         test_albums = [
@@ -139,12 +85,10 @@ class TestDiscogsIntegration:
             (4, 'Album 4', 'Artist 3', 2022, 'Electronic', 'House', 4)
         ]
         
-        for album in test_albums:
-            test_db.execute("""
-                INSERT INTO albums (discogs_id, title, artist, year, genre, style, user_rating)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, album)
-        test_db.commit()
+        bulk_insert("""
+            INSERT INTO albums (discogs_id, title, artist, year, genre, style, user_rating)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, test_albums)
         
         # Test stats calculation (would be part of client)
         with patch('discogs_client.create_discogs_client') as mock_create:
@@ -176,38 +120,6 @@ class TestDiscogsIntegration:
         conn_error = DiscogsConnectionError("Connection timeout")
         assert "Connection timeout" in str(conn_error)
     
-    @responses.activate
-    def test_api_rate_limit_handling(self):
-        """Test handling of API rate limits."""
-        # Mock rate limit response
-        responses.add(
-            responses.GET,
-            'https://api.discogs.com/users/testuser/collection/folders/0/releases',
-            status=429,
-            headers={'Retry-After': '60'}
-        )
-        
-        # Test that rate limit errors are properly handled
-        # This would be tested in the actual client implementation
-        pass
-    
-    @responses.activate  
-    def test_api_timeout_handling(self):
-        """Test handling of API timeouts."""
-        import requests
-        
-        def timeout_callback(request):
-            raise requests.Timeout("Request timed out")
-        
-        responses.add_callback(
-            responses.GET,
-            'https://api.discogs.com/users/testuser/collection/folders/0/releases',
-            callback=timeout_callback
-        )
-        
-        # Test timeout handling would be implemented in client
-        pass
-    
     def test_album_data_parsing(self):
         """Test parsing of album data from Discogs API."""
         # Sample API response data
@@ -239,18 +151,18 @@ class TestDiscogsIntegration:
     def test_sync_progress_tracking(self, test_db):
         """Test sync progress tracking functionality."""
         # Insert sync log entry
-        sync_id = 'test_sync_' + datetime.now().isoformat()
+        now_iso = datetime.now().isoformat()
+        sync_id = 'test_sync_' + now_iso
         
         test_db.execute("""
             INSERT INTO sync_log (sync_id, sync_type, started_at, status, 
                                 albums_processed, total_albums)
             VALUES (?, ?, ?, ?, ?, ?)
-        """, (sync_id, 'full_sync', datetime.now().isoformat(), 'in_progress', 10, 100))
-        test_db.commit()
+        """, (sync_id, 'full_sync', now_iso, 'in_progress', 10, 100))
         
         # Test progress retrieval
         cursor = test_db.execute("""
-            SELECT * FROM sync_log WHERE sync_id = ?
+            SELECT status, albums_processed, total_albums FROM sync_log WHERE sync_id = ?
         """, (sync_id,))
         sync_record = cursor.fetchone()
         
@@ -263,13 +175,15 @@ class TestDiscogsIntegration:
         progress = (sync_record['albums_processed'] / sync_record['total_albums']) * 100
         assert progress == 10.0
     
-    def test_incremental_sync_detection(self, test_db):
+    def test_incremental_sync_detection(self, test_db, bulk_insert):
         """Test detection of albums needing incremental sync."""
         from datetime import timedelta
         
-        # Insert albums with different sync dates
-        old_sync_date = (datetime.now() - timedelta(days=7)).isoformat()
-        recent_sync_date = (datetime.now() - timedelta(hours=1)).isoformat()
+        # Insert albums with different sync dates, all relative to one clock read
+        now = datetime.now()
+        old_sync_date = (now - timedelta(days=7)).isoformat()
+        recent_sync_date = (now - timedelta(hours=1)).isoformat()
+        one_day_ago = (now - timedelta(days=1)).isoformat()
         
         test_albums = [
             (1, 'Old Album', 'Artist 1', old_sync_date),
@@ -277,16 +191,12 @@ class TestDiscogsIntegration:
             (3, 'Never Synced', 'Artist 3', None)
         ]
         
-        for album in test_albums:
-            test_db.execute("""
-                INSERT INTO albums (discogs_id, title, artist, last_synced)
-                VALUES (?, ?, ?, ?)
-            """, album)
-        test_db.commit()
+        bulk_insert("""
+            INSERT INTO albums (discogs_id, title, artist, last_synced)
+            VALUES (?, ?, ?, ?)
+        """, test_albums)
         
         # Query albums needing sync (older than 1 day or never synced)
-        one_day_ago = (datetime.now() - timedelta(days=1)).isoformat()
-        
         cursor = test_db.execute("""
             SELECT discogs_id, title FROM albums 
             WHERE last_synced IS NULL OR last_synced < ?
@@ -296,7 +206,7 @@ class TestDiscogsIntegration:
         
         # Should include old album and never synced album
         assert len(albums_needing_sync) == 2
-        album_ids = [album['discogs_id'] for album in albums_needing_sync]
+        album_ids = [discogs_id for discogs_id, _ in albums_needing_sync]
         assert 1 in album_ids  # Old album
         assert 3 in album_ids  # Never synced
         assert 2 not in album_ids  # Recent album
\ No newline at end of file
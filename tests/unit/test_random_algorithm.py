@@ -5,13 +5,16 @@ Unit tests for the intelligent random selection algorithm.
 import pytest
 from unittest.mock import Mock, patch
 from datetime import datetime, timedelta
+from dataclasses import asdict
 import sqlite3
+from itertools import accumulate
 
 from random_algorithm import (
     RandomAlgorithm,
     AlgorithmConfig,
     calculate_album_score,
-    update_selection_history
+    update_selection_history,
+    weighted_choice
 )
 
 
@@ -237,7 +240,7 @@ class TestRandomAlgorithm:
             
             assert result is None
     
-    def test_get_random_album_with_collection(self, test_db):
+    def test_get_random_album_with_collection(self, test_db, insert_albums):
         """Test random album selection with populated collection."""
         # Insert test albums
         test_albums = [
@@ -246,12 +249,7 @@ class TestRandomAlgorithm:
             (3, 'Album 3', 'Artist 3', 2019, 'Electronic', 3)
         ]
         
-        for album in test_albums:
-            test_db.execute("""
-                INSERT INTO albums (discogs_id, title, artist, year, genre, user_rating)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, album)
-        test_db.commit()
+        insert_albums(test_albums)
         
         with patch('random_algorithm.RandomAlgorithm') as MockAlgorithm:
             mock_instance = MockAlgorithm.return_value
@@ -282,22 +280,21 @@ class TestRandomAlgorithm:
             assert result is True
             mock_record.assert_called_once_with(test_db, album_id, feedback)
     
-    def test_algorithm_statistics(self, test_db):
+    def test_algorithm_statistics(self, test_db, bulk_insert):
         """Test algorithm statistics calculation."""
         # Insert test data for statistics
+        now_iso = datetime.now().isoformat()
         test_data = [
-            (1, 0.9, datetime.now().isoformat(), 5, 'liked'),
-            (2, 0.7, datetime.now().isoformat(), 3, 'disliked'),
-            (3, 0.8, datetime.now().isoformat(), 1, 'liked')
+            (1, 0.9, now_iso, 5, 'liked'),
+            (2, 0.7, now_iso, 3, 'disliked'),
+            (3, 0.8, now_iso, 1, 'liked')
         ]
         
-        for data in test_data:
-            test_db.execute("""
-                INSERT INTO random_cache (album_id, score, last_selected, 
-                                        selection_count, last_feedback)
-                VALUES (?, ?, ?, ?, ?)
-            """, data)
-        test_db.commit()
+        bulk_insert("""
+            INSERT INTO random_cache (album_id, score, last_selected, 
+                                    selection_count, last_feedback)
+            VALUES (?, ?, ?, ?, ?)
+        """, test_data)
         
         with patch('random_algorithm.get_algorithm_statistics') as mock_stats:
             mock_stats.return_value = {
@@ -314,23 +311,22 @@ class TestRandomAlgorithm:
             assert stats['feedback_ratio'] == 0.67
             assert stats['cache_size'] == 3
     
-    def test_cache_refresh(self, test_db):
+    def test_cache_refresh(self, test_db, bulk_insert):
         """Test algorithm cache refresh functionality."""
         # Insert old cache entries
-        old_date = (datetime.now() - timedelta(days=30)).isoformat()
+        now = datetime.now()
+        old_date = (now - timedelta(days=30)).isoformat()
         
         test_data = [
             (1, 0.5, old_date, 10),
             (2, 0.3, old_date, 15),
-            (3, 0.8, datetime.now().isoformat(), 1)  # Recent entry
+            (3, 0.8, now.isoformat(), 1)  # Recent entry
         ]
         
-        for data in test_data:
-            test_db.execute("""
-                INSERT INTO random_cache (album_id, score, last_selected, selection_count)
-                VALUES (?, ?, ?, ?)
-            """, data)
-        test_db.commit()
+        bulk_insert("""
+            INSERT INTO random_cache (album_id, score, last_selected, selection_count)
+            VALUES (?, ?, ?, ?)
+        """, test_data)
         
         with patch('random_algorithm.refresh_algorithm_cache') as mock_refresh:
             mock_refresh.return_value = 2  # Number of entries refreshed
@@ -346,25 +342,13 @@ class TestRandomAlgorithm:
             {'id': 3, 'score': 0.5, 'title': 'Medium Score Album'}
         ]
         
-        # Simulate weighted random selection
-        import random
-        
-        def weighted_choice(albums):
-            total_weight = sum(album['score'] for album in albums)
-            r = random.uniform(0, total_weight)
-            current_weight = 0
-            
-            for album in albums:
-                current_weight += album['score']
-                if r <= current_weight:
-                    return album
-            
-            return albums[-1]  # Fallback
+        # Running totals are built once and reused for every pick
+        cum_weights = list(accumulate(album['score'] for album in albums))
         
         # Run many selections to test distribution
         selections = {}
         for _ in range(1000):
-            selected = weighted_choice(albums)
+            selected = weighted_choice(albums, cum_weights)
             selections[selected['id']] = selections.get(selected['id'], 0) + 1
         
         # High score album should be selected most often
@@ -382,7 +366,7 @@ class TestRandomAlgorithm:
         )
         
         # Test dict conversion
-        config_dict = config.__dict__
+        config_dict = asdict(config)
         assert config_dict['rating_weight'] == 0.4
         assert config_dict['recency_weight'] == 0.3
         